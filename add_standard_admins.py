@@ -1,29 +1,36 @@
 import getopt
-import json
-import requests
+import meraki_client
+import meraki_inventory
+import meraki_journal
+import meraki_metrics
+import meraki_trace
+import meraki_watch
+import meraki_workers
 import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from getpass import getpass
+from meraki_common import choose_org, filter_org_list, get_org_list, print_user_text
 
 
-@dataclass
-class orgData:
-    '''Class for organization level data. Mostly to add menu number.'''
-
-    id: str
-    name: str
-    menu: int
+# Org ID for the standard organization
+STANDARD_ORG_ID = "REPLACE WITH YOUR ORG ID"
 
+# Journal used by --resume when --journal isn't given
+JOURNAL_FILE = 'add_standard_admins.journal'
 
-def print_user_text(message):
-    '''
-    Prints a line of text meant for the user to read.
 
-    :param message: Line of text
+@dataclass
+class standardAdmin:
+    '''Admin from the standard org, with the request body to create it encoded once.'''
 
-    :return: None
-    '''
-    print(f'@ {message}')
+    email: str
+    name: str
+    org_access: str
+    key: str
+    payload: bytes
 
 
 def print_help():
@@ -40,33 +47,37 @@ def print_help():
     print_user_text('such as \'Calla\' or \'ssouri\'.')
     print_user_text('Use /all for all organizations you have access to.')
     print_user_text('')
+    print_user_text('-s or --sync only adds admins each org is missing.')
+    print_user_text('--update-access with --sync also fixes admins whose')
+    print_user_text('access differs from the standard org.')
+    print_user_text('-w or --workers sets how many orgs are synced at once.')
+    print_user_text('--watch <seconds> keeps checking on that schedule and prints')
+    print_user_text('DRIFT and RESOLVED lines as standard admins go missing, change')
+    print_user_text('access or are put right. Orgs that haven\'t changed are skipped.')
+    print_user_text('--processes <n> with --sync spreads orgs across n worker')
+    print_user_text('processes instead of -w threads.')
+    print_user_text('')
+    print_user_text('--metrics prints per-endpoint API latency at exit.')
+    print_user_text('--metrics-json <file> and --metrics-prom <file> also write')
+    print_user_text('the report as JSON or as a Prometheus textfile.')
+    print_user_text('')
+    print_user_text('--profile <file> writes a timeline of every API call, rate')
+    print_user_text('limit wait and org, for chrome://tracing or ui.perfetto.dev.')
+    print_user_text('--profile-stats <file> also writes cProfile stats.')
+    print_user_text('')
+    print_user_text('--journal <file> records finished admins as the run goes.')
+    print_user_text('--resume skips admins already in the journal. Defaults to')
+    print_user_text(f'{JOURNAL_FILE} when --journal isn\'t given.')
+    print_user_text('')
+    print_user_text('--inventory <file> picks orgs from a local SQLite')
+    print_user_text('inventory, refreshing entries older than a day.')
+    print_user_text('--refresh re-fetches the inventory entries used.')
+    print_user_text('')
     print_user_text('Use double quotes (/"") in Windows to pass arguments')
     print_user_text('containing spaces.')
     print_user_text('')
 
 
-def get_org_list(api_key):
-    '''
-    Return the organizations' list for a specified admin.
-    
-    :param api_key: Meraki Dashboard API key
-
-    :return: List of dictionaries containing all organizations your API key can access.
-    '''
-    
-    url = f'https://api-mp.meraki.com/api/v0/organizations/'
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    r = requests.request('GET', url, headers=headers)
-
-    if r.status_code == '401':
-        print_user_text("Invalid API key.")
-        sys.exit(1)
-
-    rjson = r.json()
-
-    return(rjson)
-
 def get_admin_list(api_key, org_id):
     #returns the organizations' list for a specified admin
     '''
@@ -78,12 +89,9 @@ def get_admin_list(api_key, org_id):
     :return: List of dictionaries containing the org's admins.
     '''
     
-    url = f'https://api-mp.meraki.com/api/v0/organizations/{org_id}/admins'
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
+    r = meraki_client.request(api_key, 'GET', f'/organizations/{org_id}/admins', org_id=org_id)
 
-    r = requests.request('GET', url, headers=headers)
-
-    if r.status_code == '401':
+    if r.status_code == 401:
         print_user_text("Invalid API key.")
         sys.exit(1)
 
@@ -92,111 +100,274 @@ def get_admin_list(api_key, org_id):
     return(rjson)
 
 
-def choose_org(org_list):
+def post_org_admin(api_key, org_id, admin_email, admin_name, admin_privilege, output=print, json_payload=None):
     '''
-    Print a menu, then return user's chosen organization.
-    
-    :param org_list: List of dicts of Meraki organizations
+    Create new administrator on an organization..
     
-    :return: List of dicts containing matching org.
+    :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID number
+    :param admin_email: String containing admin account's email
+    :param admin_name: String containing admin account's name
+    :param admin_privilege: String containing admin account's privilege level
+    :param output: Function used to print status lines
+    :param json_payload: Request body already encoded, to skip encoding it again
+
+    :return: requests.Response object
     '''
 
-    chosen_org = ''
+    if json_payload is None:
+        json_payload = meraki_client.encode_json({'name': admin_name, 'email': admin_email, 'orgAccess': admin_privilege})
+    r = meraki_client.request(api_key, 'POST', f'/organizations/{org_id}/admins', data=json_payload, org_id=org_id)
 
-    while chosen_org == '':
-        for org in org_list:
-            print(f'{org.menu}: {org.name}')
-        chosen_org = input("Enter Q to quit or select menu number: ")
+    if r.status_code == 400:
+        output(f"WARNING: {admin_email} already registered with a Cisco Meraki Dashboard account, but unverified.\nUser must verify their email address before administrator permissions can be granted.")
+    elif r.status_code != 201:
+        output(f"{admin_email} attempt returned status code: {r.status_code}\n")
+    else:
+        output(f"{admin_email} added successfully.")
 
-        if chosen_org.lower() == 'q':
-            print("Quiting program...")
-            sys.exit()
-        else:
-            for org in org_list:
-                if org.menu == int(chosen_org):
-                    return([org])
-            # If no org matches, print notice then loop.
-            print(f'No matching menu item {chosen_org}\n')
-            chosen_org == ''
+    return(r)
 
 
-def post_org_admin(api_key, org_id, admin_email, admin_name, admin_privilege):
+def put_org_admin(api_key, org_id, admin_id, admin_email, admin_privilege, output=print):
     '''
-    Create new administrator on an organization..
-    
+    Change an existing administrator's organization access.
+
     :param api_key: Meraki Dashboard API key
     :param org_id: Organization ID number
-    :param admin_email: String containing admin account's email
-    :param admin_name: String containing admin account's name
+    :param admin_id: Admin ID on that organization
+    :param admin_email: String containing admin account's email, for status lines
     :param admin_privilege: String containing admin account's privilege level
+    :param output: Function used to print status lines
 
     :return: requests.Response object
     '''
 
-    url = f'https://api-mp.meraki.com/api/v0/organizations/{org_id}/admins'
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    json_payload = json.dumps({'name': admin_name, 'email': admin_email, 'orgAccess': admin_privilege})
-    r = requests.request('POST', url, headers=headers, data=json_payload)
+    json_payload = meraki_client.encode_json({'orgAccess': admin_privilege})
+    r = meraki_client.request(api_key, 'PUT', f'/organizations/{org_id}/admins/{admin_id}', data=json_payload, org_id=org_id)
 
-    if r.status_code == 400:
-        print(f"WARNING: {admin_email} already registered with a Cisco Meraki Dashboard account, but unverified.\nUser must verify their email address before administrator permissions can be granted.")
-    elif r.status_code != 201:
-        print(f"{admin_email} attempt returned status code: {r.status_code}\n")
+    if r.status_code != 200:
+        output(f"{admin_email} update returned status code: {r.status_code}\n")
     else:
-        print(f"{admin_email} added successfully.")
+        output(f"{admin_email} access changed to {admin_privilege}.")
 
     return(r)
 
 
-def filter_org_list(api_key, filter, org_list):
+def prepare_standard_admins(admin_list):
     '''
-    Try to match a list of org IDs to a filter expression.
+    Validate the standard org's admins and encode each one's request body once
+    for the whole run.
+
+    :param admin_list: List of dictionaries containing the standard org's admins
+
+    :return: List of standardAdmin objects
+    '''
+    prepared = {}
+    for admin in admin_list:
+        if not admin.get('email') or not admin.get('name') or not admin.get('orgAccess'):
+            raise ValueError(f'Standard admin {admin.get("email")} is missing its email, name or orgAccess.')
+        key = admin['email'].lower()
+        payload = meraki_client.encode_json({'name': admin['name'], 'email': admin['email'], 'orgAccess': admin['orgAccess']})
+        prepared[key] = standardAdmin(admin['email'], admin['name'], admin['orgAccess'], key, payload)
+    return list(prepared.values())
+
+
+def index_admins(admin_list):
+    '''
+    Index admins by email address. Dashboard treats emails case-insensitively.
+
+    :param admin_list: List of dictionaries containing an org's admins
+
+    :return: Dictionary of lowercased email to admin
+    '''
+    return {admin['email'].lower(): admin for admin in admin_list}
+
+
+def sync_org_admins(api_key, org, standard_admins, update_access=False, journal=None):
+    '''
+    Add the standard admins an org is missing, and optionally fix their access.
+
+    The org's admins are read once, so only the writes that are needed are sent.
+    Status lines are collected rather than printed so orgs handled on worker
+    threads print as one block. Admins that end up in place are recorded in the
+    journal; if every standard admin for the org is already journaled, the org
+    isn't queried at all.
 
     :param api_key: Meraki Dashboard API key
-    :param filter: '/all' for all orgs or a string for finding partial matches
-    :param org_list: List of dicts containing Meraki organizations
+    :param org: orgData object
+    :param standard_admins: List of standardAdmin objects
+    :param update_access: PUT admins whose orgAccess differs from the standard
+    :param journal: meraki_journal.Journal of completed admins, or None
 
-    :return: List of dicts containing organizations that match filter, sorted alphabetically.
+    :return: Tuple of (list of output lines, Counter of results)
     '''
-    
-    return_list = []
-    process_all = False
+    journal = journal or meraki_journal.nullJournal()
+    lines = [f"\n{org.name}"]
+    results = Counter()
+
+    pending = [admin for admin in standard_admins if ('admin', org.id, admin.key) not in journal]
+    results['resumed'] += len(standard_admins) - len(pending)
+
+    with meraki_trace.span(org.name, 'org'):
+        try:
+            existing = index_admins(get_admin_list(api_key, org.id)) if pending else {}
+
+            for admin in pending:
+                current = existing.get(admin.key)
+                if current is None:
+                    r = post_org_admin(api_key, org.id, admin.email, admin.name, admin.org_access, output=lines.append,
+                                       json_payload=admin.payload)
+                    result = 'added' if r.status_code == 201 else 'failed'
+                elif current.get('orgAccess') == admin.org_access:
+                    result = 'present'
+                elif update_access:
+                    r = put_org_admin(api_key, org.id, current['id'], admin.email, admin.org_access, output=lines.append)
+                    result = 'updated' if r.status_code == 200 else 'failed'
+                else:
+                    lines.append(f"{admin.email} has {current.get('orgAccess')} access, standard is {admin.org_access}.")
+                    result = 'different'
 
-    if filter == '/all':
-        process_all = True
+                results[result] += 1
+                if result in ('added', 'present', 'updated'):
+                    journal.record('admin', org.id, admin.key)
+        except Exception as e:
+            lines.append(f"ERROR: {org.name} failed: {e}")
+            results['failed'] += 1
 
-    # Add a number to make menu-making simpler
-    menu_num = 1
+    lines.append(f"{org.name}: {results['added']} added, {results['updated']} updated, "
+                 f"{results['present']} already present, {results['different']} with different access, "
+                 f"{results['failed']} failed, {results['resumed']} done in an earlier run")
+    return lines, results
+
+
+def admin_drift(admin_list, standard_admins):
+    '''
+    Find the standard admins an org is missing or has with different access.
+
+    :param admin_list: List of dictionaries containing an org's admins
+    :param standard_admins: List of standardAdmin objects
+
+    :return: Dictionary of admin email to description of the problem
+    '''
+    existing = index_admins(admin_list)
+    problems = {}
+    for admin in standard_admins:
+        current = existing.get(admin.key)
+        if current is None:
+            problems[admin.email] = 'is missing'
+        elif current.get('orgAccess') != admin.org_access:
+            problems[admin.email] = f"has {current.get('orgAccess')} access, standard is {admin.org_access}"
+    return problems
+
+
+def watch_orgs(api_key, orgs, interval, workers=1, cycles=None):
+    '''
+    Keep checking every org's admins against the standard org's and print drift
+    as it appears and clears. Admin lists are polled with conditional requests,
+    and only orgs whose admins changed are checked again, unless the standard
+    org's admins changed.
+
+    :param api_key: Meraki Dashboard API key
+    :param orgs: List of orgData objects
+    :param interval: Seconds between the start of each pass
+    :param workers: Orgs polled at once
+    :param cycles: Stop after this many passes. None runs until Ctrl-C.
+
+    :return: None
+    '''
+    watcher = meraki_watch.ResourceWatcher()
+    tracker = meraki_watch.DriftTracker()
+
+    def check_org(org, standard_admins, recheck):
+        changed, admin_list = watcher.poll(api_key, f'/organizations/{org.id}/admins', org.id)
+        if not changed and not recheck:
+            return False, []
+        events = tracker.update(org.id, admin_drift(admin_list, standard_admins))
+        return changed, [meraki_watch.format_event(org.name, *event) for event in events]
+
+    def cycle(count):
+        try:
+            standard_changed, standard_list = watcher.poll(api_key, f'/organizations/{STANDARD_ORG_ID}/admins',
+                                                           STANDARD_ORG_ID)
+        except meraki_client.request_errors() as e:
+            # Nothing can be checked without the standard admins. Try again next pass.
+            print(f"ERROR: standard org admins failed: {e}")
+            print_user_text(f"Pass {count}: skipped")
+            return
+        standard_admins = prepare_standard_admins(standard_list)
+        changed = drifted = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(check_org, org, standard_admins, standard_changed) for org in orgs]
+            for future in futures:
+                try:
+                    org_changed, lines = future.result()
+                except Exception as e:
+                    print(f"ERROR: {e}")
+                    continue
+                changed += org_changed
+                drifted += len(lines)
+                for line in lines:
+                    print(line)
+        print_user_text(f"Pass {count}: {len(orgs)} orgs polled, {changed} changed, {drifted} events")
+
+    meraki_watch.run_every(interval, cycle, cycles)
+
+
+# Settings for sync_org, set in each worker process by init_sync_worker
+_sync_worker = {}
+
+
+def init_sync_worker(api_key, standard_admins, update_access, journal_path):
+    '''
+    Set up a worker process for sync_org.
+
+    :param api_key: Meraki Dashboard API key
+    :param standard_admins: List of standardAdmin objects
+    :param update_access: PUT admins whose orgAccess differs from the standard
+    :param journal_path: Journal file to append to, or None
+
+    :return: None
+    '''
+    _sync_worker.update(
+        api_key=api_key, standard_admins=standard_admins, update_access=update_access,
+        # The parent has already started the journal, so every worker appends to it.
+        journal=meraki_journal.Journal(journal_path, resume=True) if journal_path else meraki_journal.nullJournal())
+
+
+def sync_org(org):
+    '''
+    sync_org_admins for a worker process set up by init_sync_worker.
+
+    :param org: orgData object
+
+    :return: Tuple of (list of output lines, Counter of results)
+    '''
+    return sync_org_admins(_sync_worker['api_key'], org, _sync_worker['standard_admins'],
+                           _sync_worker['update_access'], _sync_worker['journal'])
 
-    # Sort by org name
-    sorted_orgs = sorted(org_list, key=lambda org_list: org_list['name'])
-    
-    for org in sorted_orgs:
-        if process_all:
-            return_list.append(orgData(org['id'], org['name'], menu_num))
-            menu_num += 1
-        else:
-            # Check if the filter string exists in the org's name. A return of -1 means 'no'.
-            # If it exists, create the object and add to the return list.
-            if (org['name'].lower()).find(filter) != -1:
-                return_list.append(orgData(org['id'], org['name'], menu_num))
-                menu_num += 1
-
-    # If any matches are found, len(return_list) will exist.
-    if len(return_list):
-        return(return_list)
-    else:
-        print_user_text(f'ERROR: No organizations matching: {filter}')
-        sys.exit(1)
 
 def main(argv):
     # Initialize variables for command line arguments
     arg_org_name = ''
+    arg_sync = False
+    arg_update_access = False
+    arg_workers = 1
+    arg_metrics = False
+    arg_metrics_json = None
+    arg_metrics_prom = None
+    arg_journal = None
+    arg_resume = False
+    arg_inventory = None
+    arg_refresh = False
+    arg_processes = 0
+    arg_watch = None
+    arg_profile = None
+    arg_profile_stats = None
 
     # Get command line arguments
     try:
-        opts, args = getopt.getopt(argv, 'ho:')
+        opts, args = getopt.getopt(argv, 'ho:sw:', ['sync', 'update-access', 'workers=', 'metrics', 'metrics-json=', 'metrics-prom=', 'journal=', 'resume', 'inventory=', 'refresh', 'processes=', 'watch=', 'profile=', 'profile-stats='])
     except getopt.GetoptError:
         print_user_text('Error getting opts.')
         sys.exit(2)
@@ -212,37 +383,146 @@ def main(argv):
                     sys.exit()
                 else:
                     arg_org_name = arg.lower()
+            elif opt in ('-s', '--sync'):
+                arg_sync = True
+            elif opt == '--update-access':
+                arg_update_access = True
+            elif opt in ('-w', '--workers'):
+                if not arg.isdigit() or int(arg) < 1:
+                    print_user_text('Workers must be a number of 1 or more.')
+                    sys.exit()
+                else:
+                    arg_workers = int(arg)
+            elif opt == '--metrics':
+                arg_metrics = True
+            elif opt == '--metrics-json':
+                arg_metrics_json = arg
+            elif opt == '--metrics-prom':
+                arg_metrics_prom = arg
+            elif opt == '--journal':
+                arg_journal = arg
+            elif opt == '--resume':
+                arg_resume = True
+            elif opt == '--inventory':
+                arg_inventory = arg
+            elif opt == '--refresh':
+                arg_refresh = True
+            elif opt == '--profile':
+                arg_profile = arg
+            elif opt == '--profile-stats':
+                arg_profile_stats = arg
+            elif opt == '--watch':
+                try:
+                    arg_watch = float(arg)
+                except ValueError:
+                    arg_watch = 0
+                if arg_watch <= 0:
+                    print_user_text('Watch interval must be a number of seconds above 0.')
+                    sys.exit()
+            elif opt == '--processes':
+                if not arg.isdigit() or int(arg) < 1:
+                    print_user_text('Processes must be a number of 1 or more.')
+                    sys.exit()
+                else:
+                    arg_processes = int(arg)
 
     else:
         print_user_text("No opts given.")
         print_help()
         sys.exit()
 
+    if arg_metrics or arg_metrics_json or arg_metrics_prom:
+        meraki_metrics.enable(arg_metrics, arg_metrics_json, arg_metrics_prom)
+
+    if arg_profile_stats and not arg_profile:
+        print_user_text('--profile-stats needs --profile <file>.')
+        sys.exit()
+    if arg_profile:
+        meraki_trace.enable(arg_profile, arg_profile_stats)
+
     # Use getpass() to hide API key cuz you have manners
     arg_api_key = getpass("API key: ")
 
-    # Get your organization list and check if your API key works.
-    raw_org_list = get_org_list(arg_api_key)
+    # Get your organization list and check if your API key works. With an
+    # inventory, matching orgs come from the local database instead.
+    if arg_inventory:
+        inventory = meraki_inventory.Inventory(arg_inventory, force_refresh=arg_refresh)
+        raw_org_list = inventory.get_orgs(arg_api_key, arg_org_name)
+    else:
+        inventory = None
+        raw_org_list = get_org_list(arg_api_key)
 
     # Match list of orgs to org filter
     filtered_orgs = filter_org_list(arg_api_key, arg_org_name, raw_org_list)
 
-    if len(filtered_orgs) >= 0:
-        matched_orgs = choose_org(filtered_orgs)
-    else:
+    # /all runs unattended. Otherwise pick one of the matching orgs from a menu.
+    if arg_org_name == '/all':
         print("\nRunning against all orgs...")
         matched_orgs = filtered_orgs
+    else:
+        matched_orgs = choose_org(filtered_orgs)
+
+    if arg_watch:
+        meraki_client.configure(pool_size=arg_workers)
+        watch_orgs(arg_api_key, matched_orgs, arg_watch, arg_workers)
+        if inventory:
+            inventory.close()
+        return
 
-    # Org ID for the standard organization
-    standard_org_id = "REPLACE WITH YOUR ORG ID"
     # Get admin list from standard org
-    standard_admins = get_admin_list(arg_api_key, standard_org_id)
+    standard_admins = prepare_standard_admins(get_admin_list(arg_api_key, STANDARD_ORG_ID))
 
-    # For each org that matched
-    for org in matched_orgs:
-        # Add each admin from the standard organization
-        for admin in standard_admins:
-            post_org_admin(arg_api_key, org.id, admin['email'], admin['name'], admin['orgAccess'])
+    # Record finished admins so an interrupted run can pick up where it stopped.
+    if arg_journal or arg_resume:
+        journal = meraki_journal.Journal(arg_journal or JOURNAL_FILE, arg_resume)
+    else:
+        journal = meraki_journal.nullJournal()
+
+    if arg_sync:
+        # Read each org's admins once and only write what's missing. Orgs have
+        # separate rate budgets, so they can run side by side.
+        results = Counter()
+
+        if arg_processes:
+            # Whole orgs go to worker processes and their results are merged here.
+            initargs = (arg_api_key, standard_admins, arg_update_access,
+                        (arg_journal or JOURNAL_FILE) if (arg_journal or arg_resume) else None)
+            for org, lines, org_results in meraki_workers.run_orgs(matched_orgs, sync_org, arg_processes,
+                                                                   init_sync_worker, initargs):
+                print('\n'.join(lines))
+                results.update(org_results)
+        else:
+            meraki_client.configure(pool_size=arg_workers)
+            output_lock = threading.Lock()
+
+            def run_org(org):
+                lines, org_results = sync_org_admins(arg_api_key, org, standard_admins, arg_update_access, journal)
+                with output_lock:
+                    print('\n'.join(lines))
+                    results.update(org_results)
+
+            with ThreadPoolExecutor(max_workers=arg_workers) as executor:
+                for future in [executor.submit(run_org, org) for org in matched_orgs]:
+                    future.result()
+
+        print_user_text('')
+        print_user_text(f"Orgs: {len(matched_orgs)}, admins added: {results['added']}, updated: {results['updated']}, "
+                        f"already present: {results['present']}, different access: {results['different']}, failed: {results['failed']}")
+    else:
+        # For each org that matched
+        for org in matched_orgs:
+            # Add each admin from the standard organization
+            for admin in standard_admins:
+                if ('admin', org.id, admin.key) in journal:
+                    continue
+                r = post_org_admin(arg_api_key, org.id, admin.email, admin.name, admin.org_access,
+                                   json_payload=admin.payload)
+                if r.status_code == 201:
+                    journal.record('admin', org.id, admin.key)
+
+    journal.close()
+    if inventory:
+        inventory.close()
 
 if __name__ == '__main__':
     main(sys.argv[1:])
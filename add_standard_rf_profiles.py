@@ -14,30 +14,22 @@ Use /all for all organizations you have access to.
 '''
 
 import getopt
-import json
-import requests
+import hashlib
+import meraki_client
+import meraki_common
+import meraki_inventory
+import meraki_journal
+import meraki_metrics
+import meraki_trace
+import meraki_watch
+import meraki_workers
 import sys
-from copy import copy
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from getpass import getpass
-
-
-@dataclass
-class orgData:
-    '''Class for organization level data. Mostly to add menu number.'''
-
-    id: str
-    name: str
-    menu: int
-
-
-def print_user_text(message):
-    '''
-    Prints a line of text meant for the user to read.
-    :param message: Line of text
-    :return: None
-    '''
-    print(f'@ {message}')
+from meraki_common import choose_org, filter_org_list, get_org_list, print_user_text
 
 
 def print_help():
@@ -53,215 +45,568 @@ def print_help():
     print_user_text('such as \'Calla\' or \'ssouri\'.')
     print_user_text('Use /all for all organizations you have access to.')
     print_user_text('')
+    print_user_text('-w or --workers sets how many networks are handled at')
+    print_user_text('once. Defaults to 1.')
+    print_user_text('')
+    print_user_text('--per-page sets how many networks are fetched per page.')
+    print_user_text('')
+    print_user_text('--metrics prints per-endpoint API latency at exit.')
+    print_user_text('--metrics-json <file> and --metrics-prom <file> also write')
+    print_user_text('the report as JSON or as a Prometheus textfile.')
+    print_user_text('')
+    print_user_text('--profile <file> writes a timeline of every API call, rate')
+    print_user_text('limit wait and network, for chrome://tracing or ui.perfetto.dev.')
+    print_user_text('--profile-stats <file> also writes cProfile stats.')
+    print_user_text('')
+    print_user_text('--journal <file> records finished profiles as the run goes.')
+    print_user_text('--resume skips profiles already in the journal. Defaults to')
+    print_user_text(f'{JOURNAL_FILE} when --journal isn\'t given.')
+    print_user_text('')
+    print_user_text('--inventory <file> picks orgs and networks from a local SQLite')
+    print_user_text('inventory, refreshing entries older than a day.')
+    print_user_text('--refresh re-fetches the inventory entries used.')
+    print_user_text('')
+    print_user_text('--processes <n> with -o /all spreads orgs across n worker')
+    print_user_text('processes, each running -w workers on its own orgs.')
+    print_user_text('')
+    print_user_text('--watch <seconds> keeps checking on that schedule and prints')
+    print_user_text('DRIFT and RESOLVED lines as profiles go missing, change or')
+    print_user_text('are put right. Networks that haven\'t changed are skipped.')
+    print_user_text('')
+    print_user_text('--fix updates profiles with wrong settings, sending only the')
+    print_user_text('fields that differ. Fixes go out as action batches per org.')
+    print_user_text('')
     print_user_text('Use double quotes (/"") in Windows to pass arguments')
     print_user_text('containing spaces.')
     print_user_text('')
 
-def get_network_list(api_key, org_id):
+def get_network_list(api_key, org_id, per_page=None):
     '''
-    Return list of networks for specified organization.
-    
-    :param api_key: Meraki Dashboard API key
-    :param org_id: Organization ID number
-
-    :return: List of dictionaries containing all networks for an organization.
-    '''
-
-    url = f'https://api-mp.meraki.com/api/v0/organizations/{org_id}/networks'
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    r = requests.request('GET', url, headers=headers)
-
-    rjson = r.json()
+    Yield the networks for specified organization.
 
-    return(rjson)
-
-
-def get_org_list(api_key):
-    '''
-    Return the organizations' list for a specified admin.
+    Later pages are fetched in the background, so callers can start work on
+    the first page's networks straight away.
     
     :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID number
+    :param per_page: Number of networks to request per page
 
-    :return: List of dictionaries containing all organizations your API key can access.
+    :return: Generator of meraki_common.networkData objects for all networks in an organization.
     '''
-    
-    url = f'https://api-mp.meraki.com/api/v0/organizations/'
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    r = requests.request('GET', url, headers=headers)
-
-    if r.status_code == '401':
-        print_user_text("Invalid API key.")
-        sys.exit(1)
-
-    rjson = r.json()
 
-    return(rjson)
+    # Each page is cut down to networkData as it's parsed, and not kept in the read cache.
+    return meraki_client.paginate(api_key, f'/organizations/{org_id}/networks', per_page=per_page,
+                                  org_id=org_id, prefetch=True, project=meraki_common.parse_network, cache=False)
 
 
-def post_rf_profile(api_key, network_id, rf_profile_payload):
+def post_rf_profile(api_key, network_id, rf_profile_payload, org_id=None, output=print, json_payload=None):
     '''
     Create new RF profile.
     
     :param api_key: Meraki Dashboard API key
     :param network_id: Network ID number
     :param rf_profile_payload: Dictionary containing RF profile settings
+    :param org_id: Organization ID the network belongs to, for rate limiting
+    :param output: Function used to print status lines
+    :param json_payload: rf_profile_payload already encoded, to skip encoding it again
 
     :return: requests.Response object
     '''
 
-    url = f"https://api-mp.meraki.com/api/v0/networks/{network_id}/wireless/rfProfiles"
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    json_payload = json.dumps(rf_profile_payload)
-    r = requests.request('POST', url, headers=headers, data=json_payload)
+    if json_payload is None:
+        json_payload = meraki_client.encode_json(rf_profile_payload)
+    r = meraki_client.request(api_key, 'POST', f'/networks/{network_id}/wireless/rfProfiles', data=json_payload, org_id=org_id)
 
     if r.status_code == 400:
-        print(f"{rf_profile_payload['name']} returned status code: {r.status_code}. Possible bad JSON or profile already exists.\n")
+        output(f"{rf_profile_payload['name']} returned status code: {r.status_code}. Possible bad JSON or profile already exists.\n")
     elif r.status_code != 201:
-        print(f"{rf_profile_payload['name']} returned status code: {r.status_code}\n")
+        output(f"{rf_profile_payload['name']} returned status code: {r.status_code}\n")
     else:
-        print(f"{rf_profile_payload['name']} added successfully.")
+        output(f"{rf_profile_payload['name']} added successfully.")
 
     return(r)
 
 
-def get_rf_profiles(api_key, network_id):
+def get_rf_profiles(api_key, network_id, org_id=None):
     '''
     Pull all RF profiles for a network.
     
     :param api_key: Meraki Dashboard API key
     :param network_id: Network ID number
+    :param org_id: Organization ID the network belongs to, for rate limiting
 
     :return: List of dictionaries containing a network's configured RF Profiles
     '''
 
-    url = f"https://api-mp.meraki.com/api/v0/networks/{network_id}/wireless/rfProfiles"
-    headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
-
-    r = requests.request('GET', url, headers=headers)
+    r = meraki_client.request(api_key, 'GET', f'/networks/{network_id}/wireless/rfProfiles', org_id=org_id)
 
     rjson = r.json()
 
     return(rjson)
 
 
-def profile_exist_check(exists_list, new_profile_name):
+# Journal used by --resume when --journal isn't given
+JOURNAL_FILE = 'add_standard_rf_profiles.journal'
+
+# Keys Dashboard adds to every profile that the standard profiles never set.
+SERVER_ONLY_KEYS = ('id', 'networkId')
+
+
+@dataclass
+class standardProfile:
+    '''Standard RF profile with its canonical form, fingerprint and request body worked out once.'''
+
+    name: str
+    settings: dict
+    canonical: dict
+    fingerprint: str
+    payload: bytes
+
+
+def canonicalize_profile(profile, shape=None):
+    '''
+    Return a copy of a profile that compares equal regardless of ordering.
+
+    Server-only keys are dropped and lists of plain values, such as
+    validAutoChannels, are sorted. When shape is given, only keys present in
+    shape are kept, so fields Dashboard fills in with defaults are ignored.
+
+    :param profile: Dictionary containing an RF profile, or part of one
+    :param shape: Dictionary whose keys limit which keys are kept
+
+    :return: Dictionary containing the canonical profile
+    '''
+    canonical = {}
+    for key, value in profile.items():
+        if key in SERVER_ONLY_KEYS or (shape is not None and key not in shape):
+            continue
+        sub_shape = shape.get(key) if shape is not None else None
+        if isinstance(value, dict):
+            value = canonicalize_profile(value, sub_shape if isinstance(sub_shape, dict) else None)
+        elif isinstance(value, list) and all(not isinstance(item, (dict, list)) for item in value):
+            value = sorted(value, key=lambda item: (str(type(item)), item))
+        canonical[key] = value
+    return canonical
+
+
+def profile_fingerprint(canonical_profile):
+    '''
+    Hash a canonical profile.
+
+    :param canonical_profile: Dictionary returned by canonicalize_profile
+
+    :return: Hex digest string
+    '''
+    return hashlib.sha256(meraki_client.encode_json(canonical_profile, sort_keys=True)).hexdigest()
+
+
+def prepare_standard_profiles(new_profiles):
+    '''
+    Validate, canonicalize, fingerprint and encode the standard profiles once
+    for the whole run.
+
+    :param new_profiles: List of dictionaries containing the standard RF profiles
+
+    :return: List of standardProfile objects
+    '''
+    prepared = []
+    names = set()
+    for profile in new_profiles:
+        name = profile.get('name')
+        if not name:
+            raise ValueError('Every standard RF profile needs a name.')
+        if name in names:
+            raise ValueError(f'Standard RF profile {name} is defined more than once.')
+        names.add(name)
+        canonical = canonicalize_profile(profile)
+        prepared.append(standardProfile(name, profile, canonical, profile_fingerprint(canonical),
+                                        meraki_client.encode_json(profile)))
+    return prepared
+
+
+def index_profiles(exists_list):
+    '''
+    Index a network's RF profiles by name.
+
+    :param exists_list: List of dictionaries containing a network's configured RF Profiles
+
+    :return: Dictionary of profile name to profile
+    '''
+    return {extant.get('name'): extant for extant in exists_list}
+
+
+def profile_exist_check(exists_index, new_profile_name):
     '''
     Check if a profile with the same name exists.
     
-    :param exists_list: List of dictionaries containing a network's configured RF Profiles
+    :param exists_index: Dictionary of profile name to profile, from index_profiles
     :param new_profile_name: Name of proposed new RF Profile
 
     :return: Empty dictionary if no matching name, or containing settings if match exists
     '''
 
-    for extant in exists_list:
-        if extant['name'] == new_profile_name:
-            return extant
-    return {}
+    return exists_index.get(new_profile_name, {})
 
 
-def check_profile_settings_match(existing_profile, new_profile):
+def check_profile_settings_match(existing_profile, standard_profile):
     '''
-    Remove networkId and RF Profile ID then return true if existing matches new.
+    Return true if the existing profile's settings match the standard profile.
+
+    Ordering of lists, server-only keys and fields the standard profile
+    doesn't set are ignored.
     
     :param existing_profile: Dictionary containing existing RF profile
-    :param new_profile: Dictionary containing standard RF profile
+    :param standard_profile: standardProfile object
 
     :return: bool
 
     '''
-    # Copy to new var so you don't modify underlying dict
-    modifiable_profile = copy(existing_profile)
+    canonical = canonicalize_profile(existing_profile, standard_profile.canonical)
+    return profile_fingerprint(canonical) == standard_profile.fingerprint
 
-    # New profiles don't include 'id' or 'networkId', so pop to remove.
-    remove = ['id', 'networkId']
-    for item in remove:
-        modifiable_profile.pop(item)
 
-    # Check if all the values match. They should be in the same order.
-    return modifiable_profile == new_profile
+def profile_diff(existing_profile, standard_profile, path=''):
+    '''
+    List the fields where an existing profile differs from the standard one.
 
+    :param existing_profile: Dictionary containing existing RF profile, or part of one
+    :param standard_profile: Dictionary containing the canonical standard profile, or part of one
+    :param path: Dotted path of the parts being compared
 
-def filter_org_list(api_key, filter, org_list):
+    :return: List of (field path, existing value, standard value) tuples
     '''
-    Try to match a list of org IDs to a filter expression.
+    existing = canonicalize_profile(existing_profile, standard_profile)
+    differences = []
+    for key, expected in standard_profile.items():
+        field = f'{path}.{key}' if path else key
+        actual = existing.get(key)
+        if isinstance(expected, dict) and isinstance(actual, dict):
+            differences += profile_diff(actual, expected, field)
+        elif actual != expected:
+            differences.append((field, actual, expected))
+    return differences
+
+
+def profile_patch(existing_profile, standard_profile):
+    '''
+    Build the update that makes an existing profile match the standard. Only
+    top-level fields that differ are sent, but a differing sub-object such as
+    fiveGhzSettings is sent whole, so the result is the same whether Dashboard
+    merges or replaces nested objects.
+
+    :param existing_profile: Dictionary containing existing RF profile
+    :param standard_profile: Dictionary containing the canonical standard profile
+
+    :return: Dictionary to send as the update body. Empty if nothing differs.
+    '''
+    existing = canonicalize_profile(existing_profile, standard_profile)
+    return {key: expected for key, expected in standard_profile.items() if existing.get(key) != expected}
+
+
+def apply_profile_fixes(api_key, org, fixes, journal=None):
+    '''
+    Send queued profile fixes for one org as action batches.
 
     :param api_key: Meraki Dashboard API key
-    :param filter: '/all' for all orgs or a string for finding partial matches
-    :param org_list: List of dicts containing Meraki organizations
+    :param org: orgData object
+    :param fixes: List of (networkData, profile name, action dictionary) tuples
+    :param journal: meraki_journal.Journal of completed profiles, or None
 
-    :return: List of dicts containing organizations that match filter, sorted alphabetically.
+    :return: Tuple of (list of output lines, Counter of results)
     '''
-    return_list = []
-    process_all = False
+    journal = journal or meraki_journal.nullJournal()
+    lines = [f"\n{org.name}: fixing {len(fixes)} profiles"]
+    results = Counter()
+    by_resource = {action['resource']: (network, name) for network, name, action in fixes}
+
+    with meraki_trace.span(f'{org.name} fixes', 'fixes', profiles=len(fixes)):
+        try:
+            for chunk, batch in meraki_client.run_action_batches(api_key, org.id, (action for _, _, action in fixes)):
+                status = batch.get('status', {})
+                if status.get('completed') and not status.get('failed'):
+                    error = None
+                elif status.get('failed'):
+                    error = '; '.join(status.get('errors') or ['batch failed'])
+                else:
+                    error = 'batch did not finish before timeout'
+                # Action batches are atomic, so every fix in a batch shares its result.
+                for action in chunk:
+                    network, name = by_resource[action['resource']]
+                    if error:
+                        lines.append(f"{network.name}: {name} fix failed: {error}")
+                        results['failed'] += 1
+                    else:
+                        lines.append(f"{network.name}: {name} fixed ({', '.join(action['body'])})")
+                        results['fixed'] += 1
+                        journal.record('rf-profile', org.id, network.id, name)
+        except meraki_client.APIError as e:
+            lines.append(f"ERROR: fixes for {org.name} failed: {e}")
+            results['failed'] += len(fixes) - results['fixed'] - results['failed']
 
-    if filter == '/all':
-        process_all = True
+    return lines, results
 
-    # Add a number to make menu-making simpler
-    menu_num = 1
 
-    # Sort by org name
-    sorted_orgs = sorted(org_list, key=lambda org_list: org_list['name'])
-    
-    # 
-    for org in sorted_orgs:
-        if process_all:
-            return_list.append(orgData(org['id'], org['name'], menu_num))
-            menu_num += 1
-        else:
-            if (org['name'].lower()).find(filter) != -1:
-                return_list.append(orgData(org['id'], org['name'], menu_num))
-                menu_num += 1
+def process_network(api_key, org, network, standard_profiles, journal=None, fixes=None):
+    '''
+    Check one wireless network's RF profiles and create any that are missing.
 
-    if len(return_list):
-        return(return_list)
-    else:
-        print_user_text(f'ERROR: No organizations matching: {filter}')
-        sys.exit(1)
+    Status lines are collected rather than printed so that networks handled on
+    worker threads print as one block instead of interleaving. Profiles that
+    end up correct are recorded in the journal; if every standard profile for
+    the network is already journaled, the network isn't queried at all.
 
+    :param api_key: Meraki Dashboard API key
+    :param org: orgData object for the network's organization
+    :param network: networkData object for the network
+    :param standard_profiles: List of standardProfile objects
+    :param journal: meraki_journal.Journal of completed profiles, or None
+    :param fixes: List that profiles with wrong settings are queued on for
+        apply_profile_fixes, as (network, profile name, action) tuples. None only reports them.
+
+    :return: Tuple of (list of output lines, Counter of results)
+    '''
+    journal = journal or meraki_journal.nullJournal()
+    lines = [f"\n{org.name}: {network.name}"]
+    results = Counter()
+
+    pending = [profile for profile in standard_profiles
+               if ('rf-profile', org.id, network.id, profile.name) not in journal]
+    if not pending:
+        lines.append("All profiles done in an earlier run. Skipping.")
+        results['resumed'] += len(standard_profiles)
+        lines.append("")
+        return lines, results
+    results['resumed'] += len(standard_profiles) - len(pending)
+
+    with meraki_trace.span(network.name, 'network', org=org.name):
+        try:
+            extantProfiles = index_profiles(get_rf_profiles(api_key, network.id, org.id))
+
+            for profile in pending:
+                # Check if profile by that name already exists.
+                profile_exists = profile_exist_check(extantProfiles, profile.name)
+                if profile_exists:
+                    if check_profile_settings_match(profile_exists, profile):
+                        lines.append(f"{profile.name} already exists with CORRECT settings")
+                        results['correct'] += 1
+                        journal.record('rf-profile', org.id, network.id, profile.name)
+                    else:
+                        lines.append(f"{profile.name} exists with WRONG settings.")
+                        for field, actual, expected in profile_diff(profile_exists, profile.canonical):
+                            lines.append(f"    {field}: {actual!r}, should be {expected!r}")
+                        results['wrong'] += 1
+                        if fixes is not None:
+                            fixes.append((network, profile.name, {
+                                'resource': f"/networks/{network.id}/wireless/rfProfiles/{profile_exists['id']}",
+                                'operation': 'update',
+                                'body': profile_patch(profile_exists, profile.canonical)}))
+                else:
+                    r = post_rf_profile(api_key, network.id, profile.settings, org.id, output=lines.append,
+                                        json_payload=profile.payload)
+                    if r.status_code == 201:
+                        results['created'] += 1
+                        journal.record('rf-profile', org.id, network.id, profile.name)
+                    else:
+                        results['failed'] += 1
+        except Exception as e:
+            lines.append(f"ERROR: {network.name} failed: {e}")
+            results['failed'] += 1
 
-def choose_org(org_list):
+    lines.append("")
+    return lines, results
+
+
+def network_drift(exists_list, standard_profiles):
     '''
-    Print a menu, then return user's chosen organization.
-    
-    :param org_list: List of dicts of Meraki organizations
-    
-    :return: List of dicts containing matching org.
+    Find the standard profiles a network is missing or has wrong.
+
+    :param exists_list: List of dictionaries containing a network's configured RF Profiles
+    :param standard_profiles: List of standardProfile objects
+
+    :return: Dictionary of profile name to description of the problem
+    '''
+    extantProfiles = index_profiles(exists_list)
+    problems = {}
+    for profile in standard_profiles:
+        profile_exists = profile_exist_check(extantProfiles, profile.name)
+        if not profile_exists:
+            problems[profile.name] = 'is missing'
+        elif not check_profile_settings_match(profile_exists, profile):
+            fields = ', '.join(field for field, _, _ in profile_diff(profile_exists, profile.canonical))
+            problems[profile.name] = f'has wrong settings: {fields}'
+    return problems
+
+
+def watch_orgs(api_key, orgs, standard_profiles, interval, workers=1, cycles=None, per_page=None):
+    '''
+    Keep checking every wireless network's RF profiles and print drift as it
+    appears and clears. Org network lists and each network's profiles are
+    polled with conditional requests, and only networks whose profiles changed
+    are checked again.
+
+    :param api_key: Meraki Dashboard API key
+    :param orgs: List of orgData objects
+    :param standard_profiles: List of standardProfile objects
+    :param interval: Seconds between the start of each pass
+    :param workers: Networks polled at once
+    :param cycles: Stop after this many passes. None runs until Ctrl-C.
+    :param per_page: Number of networks to request per page of each org's network list
+
+    :return: None
+    '''
+    watcher = meraki_watch.ResourceWatcher()
+    tracker = meraki_watch.DriftTracker()
+
+    def check_network(org, network):
+        changed, exists_list = watcher.poll(api_key, f"/networks/{network.id}/wireless/rfProfiles", org.id)
+        if not changed:
+            return False, []
+        events = tracker.update((org.id, network.id), network_drift(exists_list, standard_profiles))
+        return True, [meraki_watch.format_event(f"{org.name}: {network.name}", *event) for event in events]
+
+    def cycle(count):
+        checked = changed = drifted = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for org in orgs:
+                try:
+                    _, network_list = watcher.poll_listing(api_key, f'/organizations/{org.id}/networks', org.id,
+                                                          meraki_common.parse_networks, per_page)
+                except meraki_client.request_errors() as e:
+                    # One org's failure shouldn't end the watch. It's tried again next pass.
+                    print(f"ERROR: {org.name}: network list failed: {e}")
+                    continue
+                futures += [executor.submit(check_network, org, network) for network in network_list
+                            if network.has_product('wireless')]
+            for future in futures:
+                checked += 1
+                try:
+                    network_changed, lines = future.result()
+                except Exception as e:
+                    print(f"ERROR: {e}")
+                    continue
+                changed += network_changed
+                drifted += len(lines)
+                for line in lines:
+                    print(line)
+        print_user_text(f"Pass {count}: {checked} networks polled, {changed} changed, {drifted} events")
+
+    meraki_watch.run_every(interval, cycle, cycles)
+
+
+# Settings for process_org, set in each worker process by init_org_worker
+_org_worker = {}
+
+
+def init_org_worker(api_key, standard_profiles, workers, per_page, fix, journal_path, inventory_path, refresh):
     '''
+    Set up a worker process for process_org.
 
-    attempts = 0
+    :param api_key: Meraki Dashboard API key
+    :param standard_profiles: List of standardProfile objects
+    :param workers: Networks handled at once within each org
+    :param per_page: Networks fetched per page, or None
+    :param fix: Queue and send fixes for profiles with wrong settings
+    :param journal_path: Journal file to append to, or None
+    :param inventory_path: Inventory file to read networks from, or None
+    :param refresh: Re-fetch each org's networks into the inventory
+
+    :return: None
+    '''
+    meraki_client.configure(pool_size=workers)
+    _org_worker.update(
+        api_key=api_key, standard_profiles=standard_profiles, workers=workers, per_page=per_page, fix=fix,
+        # The parent has already started the journal, so every worker appends to it.
+        journal=meraki_journal.Journal(journal_path, resume=True) if journal_path else meraki_journal.nullJournal(),
+        inventory=meraki_inventory.Inventory(inventory_path, force_refresh=refresh) if inventory_path else None)
 
-    while (attempts < 3):
-        attempts += 1
-        for org in org_list:
-            print(f'{org.menu}: {org.name}')
-        chosen_org = input("Enter Q to quit or select menu number: ")
 
-        if chosen_org.lower() == 'q':
-            print("Quiting program...")
-            sys.exit()
+def process_org(org):
+    '''
+    Check every wireless network in one org, then send its fixes. Runs in a
+    worker process set up by init_org_worker.
+
+    :param org: orgData object
+
+    :return: Tuple of (list of output lines, Counter of results)
+    '''
+    api_key = _org_worker['api_key']
+    inventory = _org_worker['inventory']
+    journal = _org_worker['journal']
+    lines = []
+    results = Counter()
+    fixes = [] if _org_worker['fix'] else None
+
+    with meraki_trace.span(org.name, 'org'):
+        if inventory:
+            network_list = inventory.get_networks(api_key, org.id, 'wireless')
         else:
-            for org in org_list:
-                if org.menu == int(chosen_org):
-                    return([org])
-            # If no org matches, print notice then quit.
-            print(f'No matching menu item {chosen_org}\n')
+            network_list = get_network_list(api_key, org.id, _org_worker['per_page'])
+
+        with ThreadPoolExecutor(max_workers=_org_worker['workers']) as executor:
+            futures = []
+            for network in network_list:
+                if network.has_product('wireless'):
+                    futures.append(executor.submit(process_network, api_key, org, network,
+                                                   _org_worker['standard_profiles'], journal, fixes))
+                else:
+                    lines.append(f"{network.name}: No wireless equipment.\n")
+            for future in futures:
+                network_lines, network_results = future.result()
+                lines += network_lines
+                results.update(network_results)
+                results['networks'] += 1
+
+        if fixes:
+            fix_lines, fix_results = apply_profile_fixes(api_key, org, fixes, journal)
+            lines += fix_lines
+            results.update(fix_results)
+
+    return lines, results
+
+
+def print_summary(results):
+    '''
+    Print totals for a run.
 
-    print("No valid choice made. Exiting...")
-    sys.exit()
+    :param results: Counter of results from process_network
+
+    :return: None
+    '''
+    print_user_text('')
+    print_user_text(f"Networks processed: {results['networks']}")
+    print_user_text(f"Profiles created: {results['created']}")
+    print_user_text(f"Profiles with correct settings: {results['correct']}")
+    print_user_text(f"Profiles with wrong settings: {results['wrong']}")
+    if results['fixed']:
+        print_user_text(f"Profiles fixed: {results['fixed']}")
+    print_user_text(f"Failed: {results['failed']}")
+    if results['resumed']:
+        print_user_text(f"Skipped as done in an earlier run: {results['resumed']}")
+    print_user_text('')
 
 
 def main(argv):
     # Initialize variables for command line arguments
     arg_org_name = ''
+    arg_workers = 1
+    arg_metrics = False
+    arg_metrics_json = None
+    arg_metrics_prom = None
+    arg_journal = None
+    arg_resume = False
+    arg_inventory = None
+    arg_refresh = False
+    arg_per_page = None
+    arg_fix = False
+    arg_processes = 0
+    arg_watch = None
+    arg_profile = None
+    arg_profile_stats = None
 
     # Get command line arguments
     try:
-        opts, args = getopt.getopt(argv, 'ho:')
+        opts, args = getopt.getopt(argv, 'ho:w:', ['workers=', 'per-page=', 'metrics', 'metrics-json=', 'metrics-prom=', 'journal=', 'resume', 'inventory=', 'refresh', 'fix', 'processes=', 'watch=', 'profile=', 'profile-stats='])
     except getopt.GetoptError:
         print_user_text('Error getting opts.')
         sys.exit(2)
@@ -277,12 +622,67 @@ def main(argv):
                     sys.exit()
                 else:
                     arg_org_name = arg.lower()
+            elif opt in ('-w', '--workers'):
+                if not arg.isdigit() or int(arg) < 1:
+                    print_user_text('Workers must be a number of 1 or more.')
+                    sys.exit()
+                else:
+                    arg_workers = int(arg)
+            elif opt == '--per-page':
+                if not arg.isdigit() or int(arg) < 1:
+                    print_user_text('Per page must be a number of 1 or more.')
+                    sys.exit()
+                else:
+                    arg_per_page = int(arg)
+            elif opt == '--metrics':
+                arg_metrics = True
+            elif opt == '--metrics-json':
+                arg_metrics_json = arg
+            elif opt == '--metrics-prom':
+                arg_metrics_prom = arg
+            elif opt == '--journal':
+                arg_journal = arg
+            elif opt == '--resume':
+                arg_resume = True
+            elif opt == '--inventory':
+                arg_inventory = arg
+            elif opt == '--refresh':
+                arg_refresh = True
+            elif opt == '--fix':
+                arg_fix = True
+            elif opt == '--profile':
+                arg_profile = arg
+            elif opt == '--profile-stats':
+                arg_profile_stats = arg
+            elif opt == '--watch':
+                try:
+                    arg_watch = float(arg)
+                except ValueError:
+                    arg_watch = 0
+                if arg_watch <= 0:
+                    print_user_text('Watch interval must be a number of seconds above 0.')
+                    sys.exit()
+            elif opt == '--processes':
+                if not arg.isdigit() or int(arg) < 1:
+                    print_user_text('Processes must be a number of 1 or more.')
+                    sys.exit()
+                else:
+                    arg_processes = int(arg)
 
     else:
         print_user_text("No opts given.")
         print_help()
         sys.exit()
 
+    if arg_metrics or arg_metrics_json or arg_metrics_prom:
+        meraki_metrics.enable(arg_metrics, arg_metrics_json, arg_metrics_prom)
+
+    if arg_profile_stats and not arg_profile:
+        print_user_text('--profile-stats needs --profile <file>.')
+        sys.exit()
+    if arg_profile:
+        meraki_trace.enable(arg_profile, arg_profile_stats)
+
     # Use getpass() to hide API key cuz you have manners
     arg_api_key = getpass("API key: ")
 
@@ -296,46 +696,119 @@ def main(argv):
     # 5Ghz 20 MHz channel width
     newProfiles = [{'name': '2.4Ghz and 5Ghz 40Mhz Indoor Profile', 'clientBalancingEnabled': True, 'minBitrateType': 'band', 'bandSelectionType': 'ap', 'apBandSettings': {'bandOperationMode': 'dual', 'bandSteeringEnabled': False}, 'twoFourGhzSettings': {'maxPower': 30, 'minPower': 5, 'minBitrate': 11, 'rxsop': None, 'validAutoChannels': [1, 6, 11], 'axEnabled': True}, 'fiveGhzSettings': {'maxPower': 30, 'minPower': 8, 'minBitrate': 12, 'rxsop': None, 'validAutoChannels': [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 136, 140, 144, 149, 153, 157, 161], 'channelWidth': '40'}}, {"name": "5Ghz 40Mhz Indoor Profile", "clientBalancingEnabled": True, "minBitrateType": "band", "bandSelectionType": "ap", "apBandSettings": {"bandOperationMode": "5Ghz", "bandSteeringEnabled": False}, "twoFourGhzSettings": {"maxPower": 30, "minPower": 5, "minBitrate": 11, "rxsop": None, "validAutoChannels": [], "axEnabled": True}, "fiveGhzSettings": {"maxPower": 30, "minPower": 8, "minBitrate": 12, "rxsop": None, "validAutoChannels": [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 136, 140, 144, 149, 153, 157, 161], "channelWidth": "40"}}, {"name": "5Ghz 20Mhz Indoor Profile", "clientBalancingEnabled": True, "minBitrateType": "band", "bandSelectionType": "ap", "apBandSettings": {"bandOperationMode": "5Ghz", "bandSteeringEnabled": False}, "twoFourGhzSettings": {"maxPower": 30, "minPower": 5, "minBitrate": 11, "rxsop": None, "validAutoChannels": [], "axEnabled": True}, "fiveGhzSettings": {"maxPower": 30, "minPower": 8, "minBitrate": 12, "rxsop": None, "validAutoChannels": [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 136, 140, 144, 149, 153, 157, 161], "channelWidth": "20"}}, {'name': '2.4Ghz and 5Ghz 20Mhz Indoor Profile', 'clientBalancingEnabled': True, 'minBitrateType': 'band', 'bandSelectionType': 'ap', 'apBandSettings': {'bandOperationMode': 'dual', 'bandSteeringEnabled': False}, 'twoFourGhzSettings': {'maxPower': 30, 'minPower': 5, 'minBitrate': 11, 'rxsop': None, 'validAutoChannels': [1, 6, 11], 'axEnabled': True}, 'fiveGhzSettings': {'maxPower': 30, 'minPower': 8, 'minBitrate': 12, 'rxsop': None, 'validAutoChannels': [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 136, 140, 144, 149, 153, 157, 161], 'channelWidth': '20'}}]
 
-    # Get your organization list and check if your API key works.
-    raw_org_list = get_org_list(arg_api_key)
+    # Work out each standard profile's canonical form and fingerprint once.
+    standard_profiles = prepare_standard_profiles(newProfiles)
+
+    # Record finished profiles so an interrupted run can pick up where it stopped.
+    if arg_journal or arg_resume:
+        journal = meraki_journal.Journal(arg_journal or JOURNAL_FILE, arg_resume)
+    else:
+        journal = meraki_journal.nullJournal()
+
+    # Get your organization list and check if your API key works. With an
+    # inventory, matching orgs come from the local database instead.
+    if arg_inventory:
+        inventory = meraki_inventory.Inventory(arg_inventory, force_refresh=arg_refresh)
+        raw_org_list = inventory.get_orgs(arg_api_key, arg_org_name)
+    else:
+        inventory = None
+        raw_org_list = get_org_list(arg_api_key, arg_per_page)
 
     # Match list of orgs to org filter
     filtered_orgs = filter_org_list(arg_api_key, arg_org_name, raw_org_list)
 
-    if len(filtered_orgs) >= 0:
-        matched_orgs = choose_org(filtered_orgs)
-    else:
+    # /all runs unattended. Otherwise pick one of the matching orgs from a menu.
+    if arg_org_name == '/all':
         print("\nRunning against all orgs...")
         matched_orgs = filtered_orgs
-        print(matched_orgs)
-    
-    # Push to network in org
-    for org in matched_orgs:
-        network_list = get_network_list(arg_api_key, org.id)
-        # Put print lines like every other line and figure out why logic isn't triggering
-        for network in network_list:
-
-            # Can only add RF profiles to networks with actual APs.
-            if 'wireless' in network['productTypes']:
-                print(f"\n{org.name}: {network['name']}")
-                extantProfiles = get_rf_profiles(arg_api_key, network['id'])
-
-                for profile in newProfiles:
-                    # Check if profile by that name already exists.
-                    profile_exists = profile_exist_check(extantProfiles, profile['name'])
-                    if profile_exists:
-                        if check_profile_settings_match(profile_exists, profile):
-                            print(f"{profile['name']} already exists with CORRECT settings")
-                        else:
-                            print(f"{profile['name']} exists with WRONG settings.")
-                    else:
-                        post_rf_profile(arg_api_key, network['id'], profile)
-                print("")
+    else:
+        matched_orgs = choose_org(filtered_orgs)
 
+    if arg_watch:
+        meraki_client.configure(pool_size=arg_workers)
+        watch_orgs(arg_api_key, matched_orgs, standard_profiles, arg_watch, arg_workers, per_page=arg_per_page)
+
+        journal.close()
+        if inventory:
+            inventory.close()
+        return
+
+    if arg_processes:
+        # Whole orgs go to worker processes, each with its own connections and
+        # rate budget per org, and their results are merged here.
+        results = Counter()
+        initargs = (arg_api_key, standard_profiles, arg_workers, arg_per_page, arg_fix,
+                    (arg_journal or JOURNAL_FILE) if (arg_journal or arg_resume) else None,
+                    arg_inventory, arg_refresh)
+        for org, lines, org_results in meraki_workers.run_orgs(matched_orgs, process_org, arg_processes,
+                                                               init_org_worker, initargs):
+            print('\n'.join(lines))
+            results.update(org_results)
+
+        journal.close()
+        if inventory:
+            inventory.close()
+        print_summary(results)
+        return
+
+    # One pooled connection per worker so threads don't queue for sockets.
+    meraki_client.configure(pool_size=arg_workers)
+
+    results = Counter()
+    output_lock = threading.Lock()
+    # Profiles with wrong settings, per org, when fixing
+    fixes = {}
+
+    def run_network(org, network):
+        network_fixes = [] if arg_fix else None
+        lines, network_results = process_network(arg_api_key, org, network, standard_profiles, journal, network_fixes)
+        # Print each network's lines as one block and total results under a lock.
+        with output_lock:
+            print('\n'.join(lines))
+            results.update(network_results)
+            results['networks'] += 1
+            if network_fixes:
+                fixes.setdefault(org.id, (org, []))[1].extend(network_fixes)
+
+    def run_fixes(org, org_fixes):
+        lines, fix_results = apply_profile_fixes(arg_api_key, org, org_fixes, journal)
+        with output_lock:
+            print('\n'.join(lines))
+            results.update(fix_results)
+
+    # Push to network in org. Networks are handed to a bounded pool of workers;
+    # the per-org rate limit in meraki_client keeps them under Dashboard's budget.
+    with ThreadPoolExecutor(max_workers=arg_workers) as executor:
+        futures = []
+        for org in matched_orgs:
+            if inventory:
+                # Only wireless networks, straight from the inventory.
+                network_list = inventory.get_networks(arg_api_key, org.id, 'wireless')
             else:
-                # If no wireless APs in network, print notice and move on.
-                print(f"{network['name']}: No wireless equipment.\n")
+                # Networks from the first page go to workers while later pages download.
+                network_list = get_network_list(arg_api_key, org.id, arg_per_page)
+            for network in network_list:
 
+                # Can only add RF profiles to networks with actual APs.
+                if network.has_product('wireless'):
+                    futures.append(executor.submit(run_network, org, network))
+                else:
+                    # If no wireless APs in network, print notice and move on.
+                    with output_lock:
+                        print(f"{network.name}: No wireless equipment.\n")
+
+        for future in futures:
+            future.result()
+
+        # Fix each org's wrong profiles in as few action batches as possible.
+        # Orgs have separate rate budgets, so their batches run side by side.
+        for future in [executor.submit(run_fixes, org, org_fixes) for org, org_fixes in fixes.values()]:
+            future.result()
+
+    journal.close()
+    if inventory:
+        inventory.close()
+    print_summary(results)
 
 if __name__ == '__main__':
     main(sys.argv[1:])
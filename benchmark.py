@@ -0,0 +1,222 @@
+'''
+Throughput benchmarks for the scripts, run against mock_dashboard.
+
+Each scenario starts a fresh mock Dashboard, runs a script's main() against it
+in-process and reports wall time, API calls issued and requests per second.
+
+python benchmark.py --scale small --latency 0.02 --workers 1,8
+
+Use --rate to set the per-org rate limit. It defaults to Dashboard's real
+budget, so raise it to measure the client itself rather than the limiter.
+
+--startup instead times how long each meraki_tools subcommand takes to start
+and print its help, and exits with status 1 if any is over STARTUP_BUDGET.
+'''
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import meraki_client
+import meraki_tools
+import mock_dashboard
+
+# (orgs, networks per org, switches per org) for each scale
+SCALES = {
+    'small': (2, 50, 2),
+    'medium': (5, 500, 10),
+    'large': (10, 5000, 50),
+}
+
+
+def run_script(module_name, argv, base_url, rate, patches=None):
+    '''
+    Run a script's main() against the mock with its output suppressed.
+
+    :param module_name: Importable name of the script
+    :param argv: List of command line arguments
+    :param base_url: Mock Dashboard base URL
+    :param rate: Per-org API calls per second for meraki_client
+    :param patches: Dict of module attributes to replace for the run
+
+    :return: None
+    '''
+    module = importlib.import_module(module_name)
+    # Skip the API key prompt and the org menu.
+    module.getpass = lambda prompt='': 'benchmark'
+    if hasattr(module, 'choose_org'):
+        module.choose_org = lambda org_list: org_list
+    for name, value in (patches or {}).items():
+        setattr(module, name, value)
+
+    meraki_client.BASE_URL_OVERRIDE = base_url
+    meraki_client.configure(rate=rate)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            module.main(argv)
+        except SystemExit:
+            pass
+
+
+def write_import_file(dashboard, path):
+    '''
+    Write an import file for the mock's first switch with every other port changed.
+
+    :return: Serial number of the switch
+    '''
+    serial = next(iter(dashboard.switch_ports))
+    ports = []
+    for number, port in dashboard.switch_ports[serial].items():
+        port = dict(port)
+        if int(number) % 2:
+            port['vlan'] = 100
+        ports.append(port)
+    with open(path, 'w') as import_file:
+        json.dump(ports, import_file)
+    return serial
+
+
+def scenarios(workers, directory):
+    '''
+    Yield (name, function) pairs. Each function takes (dashboard, base_url, rate).
+    '''
+    export_file = os.path.join(directory, 'export.ndjson')
+    import_file = os.path.join(directory, 'import.json')
+
+    for count in workers:
+        yield f'rf-profiles w={count}', lambda dashboard, url, rate, count=count: run_script(
+            'add_standard_rf_profiles', ['-o', '/all', '-w', str(count)], url, rate)
+
+        yield f'admins --sync w={count}', lambda dashboard, url, rate, count=count: run_script(
+            'add_standard_admins', ['-o', '/all', '--sync', '-w', str(count)], url, rate,
+            {'STANDARD_ORG_ID': mock_dashboard.STANDARD_ORG_ID})
+
+        yield f'switchports export w={count}', lambda dashboard, url, rate, count=count: run_script(
+            'import-exportSwitchPorts',
+            ['-k', 'benchmark', '-m', 'export', '-f', export_file, '--all-switches',
+             '-o', dashboard.orgs[0]['id'], '-w', str(count)], url, rate)
+
+    yield 'switchports export --org-wide', lambda dashboard, url, rate: run_script(
+        'import-exportSwitchPorts',
+        ['-k', 'benchmark', '-m', 'export', '-f', export_file, '--all-switches', '--org-wide',
+         '-o', dashboard.orgs[0]['id']], url, rate)
+
+    def switchport_import(dashboard, url, rate, extra=()):
+        serial = write_import_file(dashboard, import_file)
+        run_script('import-exportSwitchPorts',
+                   ['-k', 'benchmark', '-m', 'import', '-f', import_file, '-s', serial,
+                    '-o', dashboard.orgs[0]['id'], *extra], url, rate)
+
+    yield 'switchports import', switchport_import
+    yield 'switchports import --batch', lambda dashboard, url, rate: switchport_import(
+        dashboard, url, rate, ['--batch'])
+
+
+def measure_startup(command, runs):
+    '''
+    Time a meraki_tools subcommand from process start until its help is printed.
+
+    :param command: Subcommand name, such as 'rf-profiles'
+    :param runs: Number of fresh interpreters to start
+
+    :return: Median wall time in seconds
+    '''
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'meraki_tools.py')
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, command, '-h'], stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def check_startup(runs):
+    '''
+    Time every subcommand's startup against meraki_tools.STARTUP_BUDGET.
+
+    :param runs: Number of runs per subcommand
+
+    :return: List of result dictionaries
+    '''
+    # A bare interpreter is the floor nothing in this repo can go under.
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    print(f'{"python -c pass":32} {time.perf_counter() - start:8.3f}')
+
+    results = []
+    for command in meraki_tools.COMMANDS:
+        seconds = measure_startup(command, runs)
+        within = seconds <= meraki_tools.STARTUP_BUDGET
+        results.append({'scenario': f'startup {command}', 'wall_seconds': round(seconds, 3),
+                        'budget_seconds': meraki_tools.STARTUP_BUDGET, 'within_budget': within})
+        print(f'{"startup " + command:32} {seconds:8.3f} {"ok" if within else "OVER BUDGET"}')
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the scripts against a mock Dashboard.')
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the mock adds to every response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls answered with 429')
+    parser.add_argument('--rate', type=float, default=10.0, help='per-org API calls per second')
+    parser.add_argument('--workers', default='1,8', help='comma-separated worker counts to compare')
+    parser.add_argument('--only', help='run only scenarios whose name contains this text')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--startup', action='store_true', help='check subcommand startup time against the budget')
+    parser.add_argument('--runs', type=int, default=5, help='runs per subcommand for --startup')
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        print(f'{"scenario":32} {"wall s":>8}  budget {meraki_tools.STARTUP_BUDGET}s')
+        results = check_startup(args.runs)
+        if args.json:
+            with open(args.json, 'w') as json_file:
+                json.dump(results, json_file, indent=2)
+        sys.exit(0 if all(result['within_budget'] for result in results) else 1)
+
+    orgs, networks, switches = SCALES[args.scale]
+    workers = [int(count) for count in args.workers.split(',')]
+    results = []
+
+    print(f'{"scenario":32} {"wall s":>8} {"calls":>7} {"req/s":>8} {"429s":>5}')
+    with tempfile.TemporaryDirectory() as directory:
+        for name, scenario in scenarios(workers, directory):
+            if args.only and args.only not in name:
+                continue
+
+            config = mock_dashboard.mockConfig(orgs=orgs, networks=networks, switches=switches,
+                                               latency=args.latency, throttle_rate=args.throttle_rate)
+            server, base_url = mock_dashboard.start_server(config)
+            start = time.perf_counter()
+            try:
+                scenario(server.dashboard, base_url, args.rate)
+            finally:
+                wall = time.perf_counter() - start
+                server.shutdown()
+                server.server_close()
+                meraki_client.close()
+                meraki_client.response_cache.clear()
+
+            calls = sum(server.dashboard.calls.values())
+            result = {'scenario': name, 'scale': args.scale, 'wall_seconds': round(wall, 3), 'calls': calls,
+                      'requests_per_second': round(calls / wall, 1) if wall else 0.0,
+                      'throttled': server.dashboard.throttled, 'calls_by_endpoint': dict(server.dashboard.calls)}
+            results.append(result)
+            print(f'{name:32} {wall:8.2f} {calls:7d} {result["requests_per_second"]:8.1f} {result["throttled"]:5d}')
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,15 +1,11 @@
-import sys, getopt, requests, json, time
-from datetime import datetime
-
-#Used for time.sleep(API_EXEC_DELAY). Delay added to avoid hitting dashboard API max request rate
-API_EXEC_DELAY = 0.21
-
-#connect and read timeouts for the Requests module
-REQUESTS_CONNECT_TIMEOUT = 30
-REQUESTS_READ_TIMEOUT    = 30
-
-#used by merakirequestthrottler(). DO NOT MODIFY
-LAST_MERAKI_REQUEST = datetime.now()
+import sys, getopt, json
+import meraki_client
+import meraki_metrics
+import meraki_snapshot
+import meraki_trace
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 def printusertext(p_message):
     #prints a line of text that is meant for the user to read
@@ -19,7 +15,7 @@ def printusertext(p_message):
 def printhelp():
     #prints help text
     printusertext('')
-    printusertext('merakirequestthrottler(), getorglist(), filterorglist(), method of getting')
+    printusertext('getorglist(), filterorglist(), method of getting')
     printusertext('opts, general approach to Meraki API/requests model use are based off')
     printusertext('manageadmins.py at')
     printusertext('https://github.com/meraki/automation-scripts/blob/master/manageadmins.py')
@@ -31,24 +27,47 @@ def printhelp():
     printusertext('-m is mode. Import to update switchports from a file. Export to export switchports to file.')
     printusertext('-f is the filename the results will print to. Use double quotes around the file name.')
     printusertext('')
+    printusertext('--batch with -m import sends port updates as Dashboard action batches instead of')
+    printusertext('one call per port. Needs -o <org id> for the organization that owns the switch.')
+    printusertext('')
+    printusertext('Export takes several serials as -s "SN1,SN2", a file of serials as --serials-file <file>,')
+    printusertext('or every switch in an org or network as --all-switches with -o <org id> or -n <network id>.')
+    printusertext('--org-wide with --all-switches -o reads every switch\'s ports from the org-wide v1 listing,')
+    printusertext('a page of switches per call. Those ports keep v1 fields, so they can\'t be imported.')
+    printusertext('Several switches are written as NDJSON, one switch per line. -w sets how many at once.')
+    printusertext('')
+    printusertext('Import reads the JSON array from a single-switch export, or NDJSON from a multi-switch')
+    printusertext('export, a piece at a time. Switches named in NDJSON lines are updated in place of -s.')
+    printusertext('')
+    printusertext('Import only sends ports and fields that differ from the switch\'s current config.')
+    printusertext('--all-ports sends every port in the file instead.')
+    printusertext('')
+    printusertext('-m snapshot saves the switches chosen as for export into a snapshot store, the')
+    printusertext('directory given with -f. Each distinct port config is stored once and each snapshot')
+    printusertext('only records the ports that changed since the one before it.')
+    printusertext('-m restore pushes the switches in a snapshot back to Dashboard, like import.')
+    printusertext('-m diff lists the ports that changed in a snapshot.')
+    printusertext('--snapshot <id> picks the snapshot for restore and diff. Defaults to the latest.')
+    printusertext('')
+    printusertext('--metrics prints per-endpoint API latency at exit. --metrics-json <file> and')
+    printusertext('--metrics-prom <file> also write the report as JSON or as a Prometheus textfile.')
+    printusertext('')
+    printusertext('--profile <file> writes a timeline of every API call, rate limit wait and switch, for')
+    printusertext('chrome://tracing or ui.perfetto.dev. --profile-stats <file> also writes cProfile stats.')
+    printusertext('')
     printusertext('Use double quotes (/"") in Windows to pass arguments containing spaces. Names are case-sensitive.')
     printusertext('')
 
-def merakirequestthrottler(p_requestcount=1):
-    #makes sure there is enough time between API requests to Dashboard to avoid hitting shaper
-    global LAST_MERAKI_REQUEST
-
-    if (datetime.now()-LAST_MERAKI_REQUEST).total_seconds() < (API_EXEC_DELAY*p_requestcount):
-        time.sleep(API_EXEC_DELAY*p_requestcount)
+# Base URL for a shard host. With no shard, meraki_client routes by org ID.
+def shardBaseUrl(p_shardurl):
+    if not p_shardurl:
+        return(None)
+    return(f"https://{p_shardurl}/api/v0")
 
-    LAST_MERAKI_REQUEST = datetime.now()
-    return
-
-# Put Switchports
-def putSwitchport(p_apikey, p_serialnumber, p_switchport, p_switchnum, p_shardurl):
-    merakirequestthrottler()
+# Put Switchports. Rate limiting and 429 retries are handled by meraki_client.
+def putSwitchport(p_apikey, p_serialnumber, p_switchport, p_switchnum, p_shardurl, p_orgid=None):
 #    try:
-    r = requests.put(f"https://{p_shardurl}/api/v0/devices/{p_serialnumber}/switchPorts/{p_switchnum}", data=json.dumps(p_switchport), headers={'X-Cisco-Meraki-API-Key': p_apikey, 'Content-Type': 'application/json'},timeout=(REQUESTS_CONNECT_TIMEOUT, REQUESTS_READ_TIMEOUT))
+    r = meraki_client.request(p_apikey, 'PUT', f"/devices/{p_serialnumber}/switchPorts/{p_switchnum}", data=json.dumps(p_switchport), base_url=shardBaseUrl(p_shardurl), org_id=p_orgid or None)
     print(f"putSwitchport: {p_switchnum}")
     #except:
 #        printusertext('Something broke')
@@ -59,29 +78,252 @@ def putSwitchport(p_apikey, p_serialnumber, p_switchport, p_switchnum, p_shardur
 
     return(rjson)
 
-# Get all switchports from a switch
-def getSwitchports(p_apikey, p_serialnumber, p_shardurl):
-    merakirequestthrottler()
+# Update switchports using action batches. Yields (port number, error or None) as each batch finishes.
+def batchSwitchports(p_apikey, p_orgid, p_serialnumber, p_switchports):
+    actions = ({'resource': f"/devices/{p_serialnumber}/switchPorts/{port['number']}",
+                'operation': 'update',
+                'body': {key: value for key, value in port.items() if key != 'number'}} for port in p_switchports)
+
+    for chunk, batch in meraki_client.run_action_batches(p_apikey, p_orgid, actions):
+        status = batch.get('status', {})
+        print(f"Action batch {batch.get('id')}: {len(chunk)} ports")
+        if status.get('completed') and not status.get('failed'):
+            error = None
+        elif status.get('failed'):
+            error = '; '.join(status.get('errors') or ['batch failed'])
+        else:
+            error = 'batch did not finish before timeout'
+        # Action batches are atomic, so every port in a batch shares its result.
+        for action in chunk:
+            yield(action['resource'].rsplit('/', 1)[-1], error)
+
+# Drop keys with empty values. Dashboard rejects null fields on update.
+def stripEmpties(p_switchport):
+    return({key: value for key, value in p_switchport.items() if value is not None})
+
+# Return only the fields of p_desired that differ from p_live, keeping the port number.
+# Both ports should already have been through stripEmpties. Returns None if nothing changed.
+def diffSwitchport(p_live, p_desired):
+    changed = {key: value for key, value in p_desired.items() if key != 'number' and p_live.get(key) != value}
+    if not changed:
+        return(None)
+    changed['number'] = p_desired['number']
+    return(changed)
+
+# Compare ports from a file against the switch's live config. Yields the ports to send.
+def changedSwitchports(p_apikey, p_serialnumber, p_switchports, p_shardurl, p_orgid=None):
+    liveports = {str(port['number']): stripEmpties(port) for port in getSwitchports(p_apikey, p_serialnumber, p_shardurl, p_orgid)}
+
+    for port in p_switchports:
+        live = liveports.get(str(port['number']))
+        if live is None:
+            # Not on the switch as far as we can tell, so send the whole port.
+            yield(port)
+        else:
+            diff = diffSwitchport(live, port)
+            if diff:
+                yield(diff)
+
+# Yield the elements of a JSON array one at a time without reading the whole file.
+# p_buffer holds whatever has already been read after the opening '['.
+def iterJsonArray(p_file, p_buffer='', p_chunksize=65536):
+    decoder = json.JSONDecoder()
+    buffer = p_buffer
+
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            element, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # The next element isn't all in the buffer yet, so read more.
+            more = p_file.read(p_chunksize)
+            if not more:
+                raise
+            buffer += more
+            continue
+        yield(element)
+        buffer = buffer[end:]
+
+# Yield (serial, port) for every port in an import file, reading it incrementally.
+# Accepts the JSON array written by a single-switch export, or NDJSON with one port or one
+# {"serial": ..., "switchPorts": [...]} switch per line as written by a multi-switch export.
+# Bare ports belong to p_serial.
+def readSwitchports(p_file, p_serial):
+    # Skip leading whitespace to see which format this is.
+    first = p_file.read(1)
+    while first.isspace():
+        first = p_file.read(1)
+
+    if first == '[':
+        records = iterJsonArray(p_file)
+    else:
+        lines = [first + p_file.readline()] if first else []
+        records = (json.loads(line) for source in (lines, p_file) for line in source if line.strip())
+
+    for record in records:
+        if record.get('apiVersion', 'v0') != 'v0':
+            # Ports in v1 form would be sent to the v0 port update with the wrong field names.
+            printusertext(f"ERROR: {record.get('serial')} was exported from the {record['apiVersion']} org-wide listing "
+                          f"and can't be imported. Export it again without --org-wide.")
+            continue
+        if 'switchPorts' in record:
+            for port in record['switchPorts']:
+                yield(record.get('serial') or p_serial, port)
+        else:
+            yield(p_serial, record)
+
+# Get all switchports from a switch. Raises meraki_client.APIError if Dashboard returns an error,
+# such as for an unknown serial, so the error body is never mistaken for a list of ports.
+def getSwitchports(p_apikey, p_serialnumber, p_shardurl, p_orgid=None):
     try:
-        r = requests.get(f'https://{p_shardurl}/api/v0/devices/{p_serialnumber}/switchPorts', headers={'X-Cisco-Meraki-API-Key': p_apikey, 'Content-Type': 'application/json'},timeout=(REQUESTS_CONNECT_TIMEOUT, REQUESTS_READ_TIMEOUT))
+        r = meraki_client.request(p_apikey, 'GET', f'/devices/{p_serialnumber}/switchPorts', base_url=shardBaseUrl(p_shardurl), org_id=p_orgid or None)
     except:
         printusertext('ERROR 02: Unable to contact Meraki cloud')
         sys.exit(2)
 
+    if not r.ok:
+        raise meraki_client.APIError(r)
+
     rjson = r.json()
 
     return(rjson)
 
+# Yield the serial of every switch in an org or network
+def getSwitchSerials(p_apikey, p_orgid, p_networkid):
+    if p_networkid:
+        devices = meraki_client.paginate(p_apikey, f'/networks/{p_networkid}/devices', org_id=p_orgid or None)
+    else:
+        devices = meraki_client.paginate(p_apikey, f'/organizations/{p_orgid}/devices', org_id=p_orgid)
+    for device in devices:
+        if device.get('model', '').startswith('MS'):
+            yield device['serial']
+
+# Fetch several switches at once. Yields (serial, ports) for each switch as soon as it
+# finishes, and only a few switches are held in memory at a time.
+def fetchSwitches(p_apikey, p_serials, p_shardurl, p_workers, p_orgid=None):
+    def fetch(serial):
+        with meraki_trace.span(serial, 'switch'):
+            return(serial, getSwitchports(p_apikey, serial, p_shardurl, p_orgid))
+
+    def results(done):
+        for future in done:
+            try:
+                yield(future.result())
+            except Exception as e:
+                printusertext(f'ERROR: export failed: {e}')
+
+    with ThreadPoolExecutor(max_workers=p_workers) as executor:
+        pending = set()
+        for serial in p_serials:
+            # Keep the queue short so serial listing and results don't pile up in memory.
+            if len(pending) >= p_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from results(done)
+            pending.add(executor.submit(fetch, serial))
+        yield from results(wait(pending).done)
+
+# Yield (serial, ports) for every switch in an org from the org-wide v1 switch ports listing,
+# a page of switches per request instead of one request per switch. Only used with --org-wide.
+# Only portId is renamed to number; the other fields are passed through in their v1 form, which
+# can differ from the per-switch v0 ports (for example macAllowList in place of macWhitelist).
+def getOrgSwitchports(p_apikey, p_orgid, p_networkid=None):
+    params = {'networkIds[]': p_networkid} if p_networkid else None
+    switches = meraki_client.paginate(p_apikey, f'/organizations/{p_orgid}/switch/ports/bySwitch', params=params,
+                                      org_id=p_orgid, prefetch=True, api_version='v1')
+    for switch in switches:
+        ports = []
+        for port in switch.get('ports') or []:
+            port = dict(port)
+            portId = port.pop('portId')
+            ports.append({'number': int(portId) if str(portId).isdigit() else portId, **port})
+        yield(switch['serial'], ports)
+
+# Yield (serial, ports) for every switch in an org or network, one call per switch.
+def allSwitchports(p_apikey, p_orgid, p_networkid, p_shardurl, p_workers):
+    yield from fetchSwitches(p_apikey, getSwitchSerials(p_apikey, p_orgid, p_networkid), p_shardurl, p_workers, p_orgid)
+
+# Export several switches, as (serial, ports) from fetchSwitches, allSwitchports or getOrgSwitchports.
+# Each switch is written to p_file as one NDJSON line as soon as it arrives. Lines from the v1
+# org-wide listing carry "apiVersion": "v1" so import can tell them apart from v0 ports.
+def exportSwitches(p_switches, p_file, p_apiversion=None):
+    exported = 0
+    for serial, ports in p_switches:
+        record = {'serial': serial, 'switchPorts': ports}
+        if p_apiversion:
+            record['apiVersion'] = p_apiversion
+        p_file.write(json.dumps(record) + '\n')
+        p_file.flush()
+        exported += 1
+        print(f"Exported {serial}")
+
+    return(exported)
+
+# Export several switches, as (serial, ports) from fetchSwitches or allSwitchports, into a
+# snapshot store. Only ports that changed since the last snapshot are recorded.
+def snapshotSwitches(p_switches, p_store):
+    def fetched():
+        for serial, ports in p_switches:
+            print(f"Exported {serial}")
+            yield(serial, ports)
+
+    return(p_store.commit(fetched()))
+
+# Push ports for one switch, from an import file or a snapshot. Returns the number of ports sent.
+def importSwitch(p_apikey, p_serial, p_switchports, p_shardurl, p_orgid, p_batch, p_allports):
+    switchportsList = (stripEmpties(port) for port in p_switchports)
+    if not p_allports:
+        # Only send ports, and fields, that differ from what the switch already has.
+        switchportsList = changedSwitchports(p_apikey, p_serial, switchportsList, p_shardurl, p_orgid)
+    sent = 0
+    try:
+        if p_batch:
+            print(f"Updating {p_serial} in action batches")
+            for switchNum, error in batchSwitchports(p_apikey, p_orgid, p_serial, switchportsList):
+                sent += 1
+                if error:
+                    print(f"Port {switchNum} failed: {error}")
+                else:
+                    print(f"Put port: {switchNum}")
+        else:
+            for port in switchportsList:
+                # Update to be putSwitchport
+                print(f"Updating {port['number']}")
+                switchNum = port['number']
+                putSwitchport(p_apikey, p_serial, port, switchNum, p_shardurl, p_orgid)
+                print(f"Put port: {port}")
+                sent += 1
+    except meraki_client.APIError as e:
+        # Such as reading the live ports of a switch that doesn't exist. Move on to the next switch.
+        printusertext(f'ERROR: {p_serial}: {e}')
+    print(f"{p_serial}: sent {sent} ports")
+    return(sent)
+
 def main(argv):
     #initialize variables for command line arguments
     arg_apikey  = ''
     arg_filename = ''
     arg_serial = ''
     arg_mode = ''
+    arg_orgid = ''
+    arg_batch = False
+    arg_allports = False
+    arg_serialsfile = ''
+    arg_networkid = ''
+    arg_allswitches = False
+    arg_orgwide = False
+    arg_workers = 4
+    arg_metrics = False
+    arg_metrics_json = None
+    arg_metrics_prom = None
+    arg_snapshot = None
+    arg_profile = None
+    arg_profile_stats = None
 
     #get command line arguments
     try:
-        opts, args = getopt.getopt(argv, 'hk:s:f:m:')
+        opts, args = getopt.getopt(argv, 'hk:s:f:m:o:n:w:', ['batch', 'all-ports', 'serials-file=', 'all-switches', 'org-wide', 'workers=', 'metrics', 'metrics-json=', 'metrics-prom=', 'snapshot=', 'profile=', 'profile-stats='])
     except getopt.GetoptError:
         printusertext('Error getting opts.')
         sys.exit(2)
@@ -112,42 +354,151 @@ def main(argv):
             if arg_mode == '':
                 printusertext('No mode given.')
                 sys.exit()
-            elif arg_mode != 'export':
-                if arg_mode != 'import':
-                    printusertext('Invalid mode given.')
-                    sys.exit()
+            elif arg_mode not in ('export', 'import', 'snapshot', 'restore', 'diff'):
+                printusertext('Invalid mode given.')
+                sys.exit()
+        elif opt == '-o':
+            arg_orgid = arg
+        elif opt == '--batch':
+            arg_batch = True
+        elif opt == '--all-ports':
+            arg_allports = True
+        elif opt == '--serials-file':
+            arg_serialsfile = arg
+        elif opt == '-n':
+            arg_networkid = arg
+        elif opt == '--all-switches':
+            arg_allswitches = True
+        elif opt == '--org-wide':
+            arg_orgwide = True
+        elif opt in ('-w', '--workers'):
+            if not arg.isdigit() or int(arg) < 1:
+                printusertext('Workers must be a number of 1 or more.')
+                sys.exit()
+            arg_workers = int(arg)
+        elif opt == '--metrics':
+            arg_metrics = True
+        elif opt == '--metrics-json':
+            arg_metrics_json = arg
+        elif opt == '--metrics-prom':
+            arg_metrics_prom = arg
+        elif opt == '--snapshot':
+            arg_snapshot = arg
+        elif opt == '--profile':
+            arg_profile = arg
+        elif opt == '--profile-stats':
+            arg_profile_stats = arg
+
+    if arg_metrics or arg_metrics_json or arg_metrics_prom:
+        meraki_metrics.enable(arg_metrics, arg_metrics_json, arg_metrics_prom)
+
+    if arg_profile_stats and not arg_profile:
+        printusertext('--profile-stats needs --profile <file>.')
+        sys.exit()
+    if arg_profile:
+        meraki_trace.enable(arg_profile, arg_profile_stats)
+
+    if arg_batch and arg_orgid == '':
+        printusertext('--batch needs -o <org id>.')
+        sys.exit()
 
-    # Using generic URL since it's just one device...
-    shard = "api.meraki.com"
+    if arg_allswitches and arg_orgid == '' and arg_networkid == '':
+        printusertext('--all-switches needs -o <org id> or -n <network id>.')
+        sys.exit()
+
+    if arg_orgwide and (arg_mode != 'export' or not arg_allswitches or arg_orgid == ''):
+        # Snapshots stay on v0 ports so every snapshot's digests are comparable.
+        printusertext('--org-wide only works with -m export --all-switches -o <org id>.')
+        sys.exit()
+
+    # With an org ID, meraki_client sends calls straight to the org's shard.
+    # Otherwise use the generic URL and let Dashboard redirect.
+    shard = None if arg_orgid else "api.meraki.com"
 
     # Check mode then do stuff
     if arg_mode == 'import':
         importFile = open(arg_filename, "r")
         if importFile.mode == 'r':
-            switchportsList = json.loads(importFile.read())
-            for port in switchportsList:
-                # Update to be putSwitchport
-                print(f"Updating {port['number']}")
-                switchNum = port['number']
-                empties = []
-                for key, value in port.items():
-                    if value == None:
-                        empties.append(key)
-                for item in empties:
-                    try:
-                        port.pop(item)
-                    except:
-                        print(f"Couldn't pop {item}")
-                putSwitchport(arg_apikey, arg_serial, port, switchNum, shard)
-                print(f"Put port: {port}")
+            # Ports are read from the file and sent as they're parsed, one switch at a time.
+            for serial, ports in groupby(readSwitchports(importFile, arg_serial), key=itemgetter(0)):
+                with meraki_trace.span(serial, 'switch'):
+                    importSwitch(arg_apikey, serial, (port for _, port in ports), shard, arg_orgid, arg_batch, arg_allports)
             
         importFile.close()
+    elif arg_mode == 'snapshot':
+        store = meraki_snapshot.SnapshotStore(arg_filename)
+        serials = [serial for serial in arg_serial.split(',') if serial]
+        if arg_serialsfile:
+            with open(arg_serialsfile, "r") as serialsFile:
+                serials += [line.strip().upper() for line in serialsFile if line.strip()]
+        if arg_allswitches:
+            switches = allSwitchports(arg_apikey, arg_orgid, arg_networkid, shard, arg_workers)
+        else:
+            switches = fetchSwitches(arg_apikey, serials, shard, arg_workers, arg_orgid)
+        snapshotId, changed = snapshotSwitches(switches, store)
+        if snapshotId:
+            print(f"Snapshot {snapshotId}: {changed} ports changed")
+        else:
+            print("No ports changed since the last snapshot. Nothing written.")
+    elif arg_mode in ('restore', 'diff'):
+        store = meraki_snapshot.SnapshotStore(arg_filename)
+        snapshotId = arg_snapshot or store.head()
+        if not snapshotId:
+            printusertext(f'No snapshots in {arg_filename}.')
+            sys.exit()
+        state = store.resolve(snapshotId)
+        serials = [serial for serial in arg_serial.split(',') if serial] or sorted(state)
+        if arg_mode == 'diff':
+            parentState = store.resolve(store.load(snapshotId)['parent'])
+            for serial, number, old, new in store.diff(parentState, state):
+                if serial not in serials:
+                    continue
+                if old is None:
+                    print(f"{serial} port {number}: added")
+                elif new is None:
+                    print(f"{serial} port {number}: removed")
+                else:
+                    oldPort, newPort = store.get_object(old), store.get_object(new)
+                    fields = sorted(key for key in set(oldPort) | set(newPort) if oldPort.get(key) != newPort.get(key))
+                    print(f"{serial} port {number}: {', '.join(fields)}")
+        else:
+            print(f"Restoring snapshot {snapshotId}")
+            for serial in serials:
+                with meraki_trace.span(serial, 'switch'):
+                    importSwitch(arg_apikey, serial, store.ports(state, serial), shard, arg_orgid, arg_batch, arg_allports)
     elif arg_mode == 'export':
+        serials = [serial for serial in arg_serial.split(',') if serial]
         exportFile = open(arg_filename, "w+")
         if exportFile.mode == 'w+':
-            switchportsList = json.dumps(getSwitchports(arg_apikey, arg_serial, shard))
-            print("Writing switchports")
-            exportFile.write(switchportsList)
+            if arg_serialsfile or arg_allswitches or len(serials) > 1:
+                # Several switches: write one NDJSON line per switch as each one finishes.
+                if arg_serialsfile:
+                    with open(arg_serialsfile, "r") as serialsFile:
+                        serials += [line.strip().upper() for line in serialsFile if line.strip()]
+                if arg_orgwide:
+                    # Every switch in the org comes from one paged v1 listing.
+                    try:
+                        exported = exportSwitches(getOrgSwitchports(arg_apikey, arg_orgid, arg_networkid), exportFile, 'v1')
+                    except meraki_client.APIError as e:
+                        printusertext(f'ERROR: org-wide switch port listing failed: {e}. Try again without --org-wide.')
+                        exportFile.close()
+                        sys.exit(2)
+                else:
+                    if arg_allswitches:
+                        switches = allSwitchports(arg_apikey, arg_orgid, arg_networkid, shard, arg_workers)
+                    else:
+                        switches = fetchSwitches(arg_apikey, serials, shard, arg_workers, arg_orgid)
+                    exported = exportSwitches(switches, exportFile)
+                print(f"Exported {exported} switches")
+            else:
+                try:
+                    switchportsList = json.dumps(getSwitchports(arg_apikey, arg_serial, shard, arg_orgid))
+                except meraki_client.APIError as e:
+                    printusertext(f'ERROR: {e}')
+                    exportFile.close()
+                    sys.exit(2)
+                print("Writing switchports")
+                exportFile.write(switchportsList)
             exportFile.close()
             print("Closing file. Please check.")
 
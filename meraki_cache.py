@@ -0,0 +1,105 @@
+'''
+In-process read-through cache for Dashboard GET responses.
+
+meraki_client keeps successful GET responses here, keyed by URL and query
+parameters, so repeated reads within a run don't go back to Dashboard.
+Entries expire after a TTL and the least recently used entries are dropped
+once the cache is full. A write to a path invalidates cached reads of that
+path, its parent collection and anything beneath it.
+'''
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# Most responses kept, and seconds each stays valid
+CACHE_SIZE = 512
+CACHE_TTL = 300
+
+
+def _resource_path(url):
+    '''Return a URL's path without a trailing slash.'''
+    return urlsplit(url).path.rstrip('/')
+
+
+class ResponseCache:
+    '''Thread-safe LRU cache of GET responses with a TTL.'''
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url, params):
+        '''
+        Build a cache key from a URL and its query parameters.
+
+        :param url: Full request URL
+        :param params: Dict of query parameters, or None
+
+        :return: Hashable key
+        '''
+        return (url, tuple(sorted((params or {}).items())))
+
+    def get(self, key):
+        '''
+        Return a cached response, or None if it's missing or expired.
+
+        :param key: Key from ResponseCache.key
+
+        :return: requests.Response object or None
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, response):
+        '''
+        Cache a response, dropping the least recently used entry if full.
+
+        :param key: Key from ResponseCache.key
+        :param response: requests.Response object
+
+        :return: None
+        '''
+        if self.size <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, url):
+        '''
+        Drop cached reads affected by a write to url: the same path, its parent
+        collection, and anything beneath it.
+
+        :param url: Full URL that was written to
+
+        :return: None
+        '''
+        path = _resource_path(url)
+        parent = path.rsplit('/', 1)[0]
+        with self.lock:
+            for key in list(self.entries):
+                cached = _resource_path(key[0])
+                if cached in (path, parent) or cached.startswith(path + '/'):
+                    del self.entries[key]
+
+    def clear(self):
+        '''Drop every cached response.'''
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,573 @@
+'''
+Shared HTTP client for the Meraki Dashboard API scripts.
+
+All of the scripts send their Dashboard calls through request() so they share
+one pooled requests.Session (keep-alive instead of a TLS handshake per call),
+the same default timeouts, one place that builds the auth headers, the
+per-organization rate limiter in meraki_throttle, the per-call metrics in
+meraki_metrics and the --profile timeline in meraki_trace. Calls tied to an
+organization go straight to that org's shard, which is looked up once and
+cached on disk. Repeated GETs within a run are served from the read cache in
+meraki_cache.
+'''
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+# orjson is imported on first use, and False until then. None if it isn't installed.
+orjson = False
+
+import meraki_cache
+import meraki_metrics
+import meraki_throttle
+import meraki_trace
+
+# Base URL for Dashboard API calls. Setting MERAKI_BASE_URL sends every call,
+# including ones made against a specific shard, to that host instead. Use it to
+# point the scripts at a local mock server.
+BASE_URL_OVERRIDE = os.environ.get('MERAKI_BASE_URL')
+BASE_URL = BASE_URL_OVERRIDE or 'https://api-mp.meraki.com/api/v0'
+
+# Connect and read timeouts for the Requests module
+REQUESTS_CONNECT_TIMEOUT = 30
+REQUESTS_READ_TIMEOUT = 30
+
+# Number of keep-alive connections kept open per host
+POOL_SIZE = 10
+
+# Times a call is retried after a 429 before the 429 is returned to the caller
+MAX_RETRIES = 5
+
+# Most actions Dashboard accepts in one asynchronous action batch
+ACTION_BATCH_LIMIT = 100
+
+# Seconds between polls of a running action batch, and how long to wait overall
+ACTION_BATCH_POLL_INTERVAL = 2
+ACTION_BATCH_TIMEOUT = 600
+
+# Pages fetched ahead of the reader when paginate() prefetches
+PREFETCH_PAGES = 2
+
+# Send calls for an org straight to its shard instead of through a redirect.
+# Each org's shard is looked up once and cached on disk for SHARD_CACHE_TTL seconds.
+SHARD_ROUTING = True
+SHARD_CACHE_FILE = os.environ.get('MERAKI_SHARD_CACHE', os.path.join(os.path.expanduser('~'), '.meraki_shards.json'))
+SHARD_CACHE_TTL = 24 * 60 * 60
+
+# Shared by every call so each org's budget is enforced across all threads
+rate_limiter = meraki_throttle.RateLimiter()
+
+# Successful GETs, reused until they expire or a write touches the same resource
+response_cache = meraki_cache.ResponseCache()
+
+_session = None
+_session_lock = threading.Lock()
+_pool_size = POOL_SIZE
+_headers = {}
+_shards = None
+_shard_lock = threading.Lock()
+# Orgs whose shard lookup failed this run, such as ones the key can't read.
+# They use BASE_URL for the rest of the run, without asking again, and
+# aren't written to disk.
+_shard_fallbacks = set()
+
+
+def configure(pool_size=None, base_url=None, connect_timeout=None, read_timeout=None, rate=None,
+              cache_size=None, cache_ttl=None):
+    '''
+    Change client settings. Call before the first request.
+
+    :param pool_size: Number of pooled connections per host
+    :param base_url: Base URL used for paths that aren't absolute URLs
+    :param connect_timeout: Seconds to wait for a connection
+    :param read_timeout: Seconds to wait for a response
+    :param rate: API calls per second allowed per organization
+    :param cache_size: Most GET responses kept in the read cache. 0 turns it off.
+    :param cache_ttl: Seconds a cached GET response stays valid. 0 turns it off.
+
+    :return: None
+    '''
+    global BASE_URL, REQUESTS_CONNECT_TIMEOUT, REQUESTS_READ_TIMEOUT, _pool_size, rate_limiter, response_cache
+
+    if base_url:
+        BASE_URL = base_url.rstrip('/')
+    if connect_timeout:
+        REQUESTS_CONNECT_TIMEOUT = connect_timeout
+    if read_timeout:
+        REQUESTS_READ_TIMEOUT = read_timeout
+    if rate:
+        rate_limiter = meraki_throttle.RateLimiter(rate=rate)
+    if cache_size is not None or cache_ttl is not None:
+        response_cache = meraki_cache.ResponseCache(
+            response_cache.size if cache_size is None else cache_size,
+            response_cache.ttl if cache_ttl is None else cache_ttl)
+    if pool_size and pool_size != _pool_size:
+        _pool_size = pool_size
+        # Rebuild the session on next use so the new pool size takes effect.
+        close()
+
+
+def build_headers(api_key):
+    '''
+    Return the auth headers for an API key. Built once per key.
+
+    :param api_key: Meraki Dashboard API key
+
+    :return: Dict of request headers
+    '''
+    headers = _headers.get(api_key)
+    if headers is None:
+        headers = {'X-Cisco-Meraki-API-Key': api_key, 'Content-Type': 'application/json'}
+        _headers[api_key] = headers
+    return headers
+
+
+def encode_json(payload, sort_keys=False):
+    '''
+    Encode a request body as compact JSON bytes. Uses orjson when it's
+    installed, otherwise the standard json module.
+
+    :param payload: JSON-serializable object
+    :param sort_keys: Sort dictionary keys, for output that's stable between runs
+
+    :return: bytes
+    '''
+    global orjson
+
+    if orjson is False:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(payload, sort_keys=sort_keys, separators=(',', ':')).encode()
+
+
+def get_session():
+    '''
+    Return the shared requests.Session, creating it on first use.
+
+    :return: requests.Session object
+    '''
+    global _session
+
+    if _session is None:
+        # Imported here rather than at the top: requests takes longer to import
+        # than the rest of a script's startup, and --help never needs it.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def request_errors():
+    '''
+    Exceptions a Dashboard call can fail with, for callers that report a
+    failure and carry on, such as --watch.
+
+    :return: Tuple of APIError and requests.RequestException
+    '''
+    import requests
+
+    return APIError, requests.RequestException
+
+
+def close():
+    '''
+    Close the shared session and its pooled connections.
+
+    :return: None
+    '''
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def build_url(path, base_url=None):
+    '''
+    Join an API path onto the base URL. Absolute URLs are returned unchanged.
+
+    :param path: API path such as '/organizations', or a full URL
+    :param base_url: Base URL to use instead of BASE_URL
+
+    :return: Full URL string
+    '''
+    if path.startswith('http://') or path.startswith('https://'):
+        return path
+    if BASE_URL_OVERRIDE:
+        base_url = BASE_URL_OVERRIDE
+    return f"{(base_url or BASE_URL).rstrip('/')}/{path.lstrip('/')}"
+
+
+def _load_shards():
+    '''Load the shard cache from disk once, dropping expired entries.'''
+    global _shards
+
+    if _shards is None:
+        shards = {}
+        try:
+            with open(SHARD_CACHE_FILE, 'r') as cache_file:
+                shards = json.load(cache_file)
+        except (OSError, ValueError):
+            pass
+        now = time.time()
+        _shards = {org_id: entry for org_id, entry in shards.items()
+                   if now - entry.get('resolved', 0) < SHARD_CACHE_TTL}
+    return _shards
+
+
+def _save_shard(org_id, shard_url):
+    '''Cache an org's shard URL in memory and on disk.'''
+    with _shard_lock:
+        _shard_fallbacks.discard(org_id)
+        shards = _load_shards()
+        shards[org_id] = {'url': shard_url, 'resolved': time.time()}
+        try:
+            # Write to a temporary file first so a crash can't leave half a cache.
+            temp_file = f'{SHARD_CACHE_FILE}.{os.getpid()}.tmp'
+            with open(temp_file, 'w') as cache_file:
+                json.dump(shards, cache_file)
+            os.replace(temp_file, SHARD_CACHE_FILE)
+        except OSError:
+            # The in-memory cache still saves the lookups for this run.
+            pass
+
+
+def _shard_from_url(url):
+    '''Return the base URL (scheme, host and API version path) for a full request URL.'''
+    parts = urlsplit(url)
+    api_path = urlsplit(BASE_URL).path.rstrip('/')
+    return f'{parts.scheme}://{parts.netloc}{api_path}'
+
+
+def resolve_shard(api_key, org_id):
+    '''
+    Return the base URL of the shard an organization lives on.
+
+    The generic host answers calls for other shards with a redirect. This asks
+    once without following it, and caches the answer on disk. If the lookup
+    fails, the org uses BASE_URL for the rest of the run without asking again.
+
+    :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID
+
+    :return: Base URL string
+    '''
+    with _shard_lock:
+        if org_id in _shard_fallbacks:
+            return BASE_URL
+        entry = _load_shards().get(org_id)
+    if entry:
+        return entry['url']
+
+    import requests
+
+    url = build_url(f'/organizations/{org_id}')
+    wait_start = time.perf_counter()
+    waited = rate_limiter.acquire(org_id)
+    start = time.perf_counter()
+    try:
+        r = get_session().get(url, headers=build_headers(api_key), allow_redirects=False,
+                              timeout=(REQUESTS_CONNECT_TIMEOUT, REQUESTS_READ_TIMEOUT))
+    except requests.RequestException:
+        r = None
+    end = time.perf_counter()
+
+    # Recorded like any other call, so lookups show up in --metrics and --profile.
+    status = r.status_code if r is not None else 'error'
+    if meraki_trace.enabled:
+        if waited:
+            meraki_trace.add_span('rate limit wait', 'throttle', wait_start, start, org_id=org_id)
+        meraki_trace.add_span(f'GET {meraki_metrics.endpoint_template(url)}', 'http', start, end,
+                              status=status, shard_lookup=True)
+    if meraki_metrics.enabled:
+        meraki_metrics.record('GET', url, status, end - start, len(r.content) if r is not None else 0,
+                              throttle_wait=waited)
+
+    if r is not None and r.is_redirect and r.headers.get('Location'):
+        shard_url = _shard_from_url(r.headers['Location'])
+    elif r is not None and r.ok:
+        shard_url = BASE_URL
+    else:
+        # Remember the failure for this run only, such as an org this key can't see.
+        with _shard_lock:
+            _shard_fallbacks.add(org_id)
+        return BASE_URL
+
+    _save_shard(org_id, shard_url)
+    return shard_url
+
+
+def _invalidate_cache(url):
+    '''Drop cached reads a write to url could have made stale.'''
+    if url.rstrip('/').endswith('/actionBatches'):
+        # An action batch can write anywhere, so nothing cached can be trusted.
+        response_cache.clear()
+    else:
+        response_cache.invalidate(url)
+
+
+def request(api_key, method, path, data=None, params=None, base_url=None, timeout=None, org_id=None, cache=True,
+            headers=None, api_version=None):
+    '''
+    Send a Dashboard API request over the shared session.
+
+    GETs are answered from the read cache when possible. Anything else
+    invalidates cached reads of the resource it writes to, both before it's
+    sent and after the response arrives. Calls that go out
+    wait on the org's rate limit bucket first, and 429 responses are retried
+    after the Retry-After period, up to MAX_RETRIES times.
+
+    :param api_key: Meraki Dashboard API key
+    :param method: HTTP method, such as 'GET' or 'POST'
+    :param path: API path such as '/organizations', or a full URL
+    :param data: Request body as a string or bytes
+    :param params: Dict of query string parameters
+    :param base_url: Base URL to use instead of BASE_URL
+    :param timeout: (connect, read) timeout tuple to use instead of the defaults
+    :param org_id: Organization ID the call counts against, for rate limiting
+    :param cache: Use the read cache for a GET. Pass False to always ask Dashboard and
+        leave the response out of the cache.
+    :param headers: Extra request headers, such as If-None-Match
+    :param api_version: API version such as 'v1', for endpoints that only exist in a newer
+        version than BASE_URL's
+
+    :return: requests.Response object
+    '''
+    if timeout is None:
+        timeout = (REQUESTS_CONNECT_TIMEOUT, REQUESTS_READ_TIMEOUT)
+
+    # Go straight to the org's shard. Skipped when MERAKI_BASE_URL points elsewhere.
+    if base_url is None and org_id and SHARD_ROUTING and not BASE_URL_OVERRIDE:
+        base_url = resolve_shard(api_key, org_id)
+
+    url = build_url(path, base_url)
+    if api_version:
+        url = re.sub(r'/api/v\d+', f'/api/{api_version}', url, count=1)
+    headers = {**build_headers(api_key), **headers} if headers else build_headers(api_key)
+
+    if method == 'GET':
+        cache_key = response_cache.key(url, params)
+        if cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+    else:
+        _invalidate_cache(url)
+
+    attempt = 0
+    throttle_wait = 0.0
+    latency = 0.0
+    while True:
+        wait_start = time.perf_counter()
+        waited = rate_limiter.acquire(org_id)
+        throttle_wait += waited
+        start = time.perf_counter()
+        r = get_session().request(method, url, headers=headers, data=data, params=params, timeout=timeout)
+        end = time.perf_counter()
+        latency += end - start
+
+        if meraki_trace.enabled:
+            if waited:
+                meraki_trace.add_span('rate limit wait', 'throttle', wait_start, start, org_id=org_id)
+            meraki_trace.add_span(f'{method} {meraki_metrics.endpoint_template(url)}', 'http', start, end,
+                                  status=r.status_code, attempt=attempt, bytes=len(r.content))
+
+        if r.status_code != 429 or attempt >= MAX_RETRIES:
+            break
+        rate_limiter.throttled(org_id, meraki_throttle.parse_retry_after(r.headers.get('Retry-After'), attempt))
+        attempt += 1
+
+    if r.status_code != 429:
+        rate_limiter.succeeded(org_id)
+
+    # The org moved shards since it was cached; remember where it went.
+    if r.history and org_id and SHARD_ROUTING and not BASE_URL_OVERRIDE:
+        _save_shard(org_id, _shard_from_url(r.url))
+
+    if meraki_metrics.enabled:
+        meraki_metrics.record(method, url, r.status_code, latency, len(r.content), attempt, throttle_wait)
+
+    if method == 'GET' and cache and r.status_code == 200:
+        response_cache.put(cache_key, r)
+    elif method != 'GET':
+        # Again once the write has landed, in case another thread's GET cached
+        # the old state while it was in flight.
+        _invalidate_cache(url)
+
+    return r
+
+
+class APIError(Exception):
+    '''Raised when Dashboard returns an error status for a call that can't continue.'''
+
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f'{response.request.method} {response.url} returned status code: {response.status_code}')
+
+
+def _fetch_pages(api_key, path, params, org_id, api_version=None, project=None, cache=True):
+    '''
+    Yield each page of a listing, following Link: rel=next headers.
+
+    :return: Generator of lists of dictionaries, or of whatever project returns
+    '''
+    url = path
+    while url:
+        r = request(api_key, 'GET', url, params=params, org_id=org_id, api_version=api_version, cache=cache)
+        if not r.ok:
+            raise APIError(r)
+        if project:
+            # Project as soon as the page is parsed so its full dicts never outlive it.
+            yield [project(item) for item in r.json()]
+        else:
+            yield r.json()
+
+        # The next link already carries the paging query string.
+        url = r.links.get('next', {}).get('url')
+        params = None
+
+
+def _prefetch_pages(pages, depth):
+    '''
+    Fetch pages on a background thread, up to depth pages ahead of the reader.
+
+    :return: Generator of lists of dictionaries
+    '''
+    done = object()
+    pending = queue.Queue(maxsize=depth)
+
+    def producer():
+        try:
+            for page in pages:
+                pending.put(page)
+        except Exception as e:
+            pending.put(e)
+        pending.put(done)
+
+    threading.Thread(target=producer, daemon=True).start()
+
+    while True:
+        page = pending.get()
+        if page is done:
+            return
+        if isinstance(page, Exception):
+            raise page
+        yield page
+
+
+def paginate(api_key, path, params=None, per_page=None, org_id=None, prefetch=False, api_version=None,
+             project=None, cache=True):
+    '''
+    Yield every item from a paginated Dashboard listing.
+
+    Items from the first page are available as soon as it arrives. With
+    prefetch, later pages are fetched in the background while the caller works
+    through earlier ones.
+
+    :param api_key: Meraki Dashboard API key
+    :param path: API path of the listing, such as '/organizations'
+    :param params: Dict of extra query string parameters
+    :param per_page: Number of items to request per page, or None for the server default
+    :param org_id: Organization ID the calls count against, for rate limiting
+    :param prefetch: Fetch the next page in the background while items are consumed
+    :param api_version: API version such as 'v1', for listings only available in a newer version
+    :param project: Function applied to each item as its page is parsed, such as
+        meraki_common.parse_network, to keep only the fields the caller needs
+    :param cache: Use the read cache. Pass False for large listings read once, so
+        their pages aren't kept in memory.
+
+    :return: Generator of dictionaries, or of whatever project returns
+    '''
+    params = dict(params or {})
+    if per_page:
+        params['perPage'] = per_page
+
+    pages = _fetch_pages(api_key, path, params or None, org_id, api_version, project, cache)
+    if prefetch:
+        pages = _prefetch_pages(pages, PREFETCH_PAGES)
+
+    for page in pages:
+        yield from page
+
+
+def submit_action_batch(api_key, org_id, actions):
+    '''
+    Submit an asynchronous, confirmed action batch.
+
+    :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID that owns the resources
+    :param actions: List of action dictionaries, no more than ACTION_BATCH_LIMIT
+
+    :return: Dictionary containing the created action batch
+    '''
+    payload = encode_json({'confirmed': True, 'synchronous': False, 'actions': actions})
+    r = request(api_key, 'POST', f'/organizations/{org_id}/actionBatches', data=payload, org_id=org_id)
+    if r.status_code not in (200, 201):
+        raise APIError(r)
+    return r.json()
+
+
+def wait_action_batch(api_key, org_id, batch_id):
+    '''
+    Poll an action batch until it completes, fails or ACTION_BATCH_TIMEOUT passes.
+
+    :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID that owns the batch
+    :param batch_id: Action batch ID
+
+    :return: Dictionary containing the action batch in its last known state
+    '''
+    deadline = time.monotonic() + ACTION_BATCH_TIMEOUT
+    while True:
+        # Each poll has to reach Dashboard; a cached status would never change.
+        r = request(api_key, 'GET', f'/organizations/{org_id}/actionBatches/{batch_id}', org_id=org_id, cache=False)
+        if not r.ok:
+            raise APIError(r)
+        batch = r.json()
+        status = batch.get('status', {})
+        if status.get('completed') or status.get('failed') or time.monotonic() > deadline:
+            return batch
+        time.sleep(ACTION_BATCH_POLL_INTERVAL)
+
+
+def run_action_batches(api_key, org_id, actions):
+    '''
+    Split actions into action batches, submit each and wait for it to finish.
+
+    :param api_key: Meraki Dashboard API key
+    :param org_id: Organization ID that owns the resources
+    :param actions: Iterable of action dictionaries
+
+    :return: Generator of (list of actions, action batch dictionary) tuples, one per batch
+    '''
+    chunk = []
+    for action in actions:
+        chunk.append(action)
+        if len(chunk) == ACTION_BATCH_LIMIT:
+            yield chunk, _run_action_batch(api_key, org_id, chunk)
+            chunk = []
+    if chunk:
+        yield chunk, _run_action_batch(api_key, org_id, chunk)
+
+
+def _run_action_batch(api_key, org_id, chunk):
+    batch = submit_action_batch(api_key, org_id, chunk)
+    return wait_action_batch(api_key, org_id, batch['id'])
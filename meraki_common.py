@@ -0,0 +1,179 @@
+'''
+Pieces shared by the org-level scripts: user text, the org menu, org list
+lookups and the compact org and network records.
+
+Org and network listings are projected to slotted records as each page is
+parsed, keeping only the fields the scripts use. A network's product types
+are kept as a bitmask of PRODUCT_TYPES, so a 50,000 network inventory holds
+three small fields per network instead of every field Dashboard returns.
+
+Only the standard library and meraki_client are imported here, so anything
+that imports this module still starts quickly.
+'''
+
+import sys
+from dataclasses import dataclass
+from operator import itemgetter
+
+import meraki_client
+
+
+# Product types a network's bitmask can hold. Append new types; don't reorder.
+PRODUCT_TYPES = ('appliance', 'camera', 'cellularGateway', 'sensor', 'switch', 'systemsManager', 'wireless')
+PRODUCT_BITS = {product_type: 1 << bit for bit, product_type in enumerate(PRODUCT_TYPES)}
+
+
+@dataclass
+class orgData:
+    '''Class for organization level data. Mostly to add menu number.'''
+
+    __slots__ = ('id', 'name', 'menu')
+
+    id: str
+    name: str
+    menu: int
+
+
+@dataclass
+class networkData:
+    '''The parts of a network the scripts use, with product types as a PRODUCT_BITS mask.'''
+
+    __slots__ = ('id', 'name', 'product_types')
+
+    id: str
+    name: str
+    product_types: int
+
+    def has_product(self, product_type):
+        '''
+        :param product_type: Product type such as 'wireless'
+
+        :return: True if the network has that product type
+        '''
+        return bool(self.product_types & PRODUCT_BITS.get(product_type, 0))
+
+
+def product_mask(product_types):
+    '''
+    :param product_types: Iterable of product type names. Names not in PRODUCT_TYPES are ignored.
+
+    :return: Integer bitmask of PRODUCT_BITS
+    '''
+    mask = 0
+    for product_type in product_types or ():
+        mask |= PRODUCT_BITS.get(product_type, 0)
+    return mask
+
+
+def parse_network(network):
+    '''
+    Project a network from the Dashboard API down to a networkData.
+
+    :param network: Dictionary from a network listing
+
+    :return: networkData object
+    '''
+    return networkData(network['id'], network['name'], product_mask(network.get('productTypes')))
+
+
+def parse_networks(networks):
+    '''
+    :param networks: List of network dictionaries, such as a whole listing body
+
+    :return: List of networkData objects
+    '''
+    return [parse_network(network) for network in networks]
+
+
+def print_user_text(message):
+    '''
+    Prints a line of text meant for the user to read.
+
+    :param message: Line of text
+
+    :return: None
+    '''
+    print(f'@ {message}')
+
+
+def get_org_list(api_key, per_page=None):
+    '''
+    Yield the organizations for a specified admin, one page at a time.
+
+    :param api_key: Meraki Dashboard API key
+    :param per_page: Number of organizations to request per page
+
+    :return: Generator of dictionaries containing all organizations your API key can access.
+    '''
+
+    try:
+        yield from meraki_client.paginate(api_key, '/organizations', per_page=per_page)
+    except meraki_client.APIError as e:
+        if e.status_code == 401:
+            print_user_text("Invalid API key.")
+            sys.exit(1)
+        raise
+
+
+def filter_org_list(api_key, filter, org_list):
+    '''
+    Try to match a list of org IDs to a filter expression.
+
+    :param api_key: Meraki Dashboard API key
+    :param filter: '/all' for all orgs or a string for finding partial matches
+    :param org_list: List of dicts containing Meraki organizations
+
+    :return: List of orgData objects that match filter, sorted alphabetically.
+    '''
+
+    process_all = False
+
+    if filter == '/all':
+        process_all = True
+
+    # Keep just the name and ID of orgs whose name contains the filter (a find()
+    # of -1 means 'no') as they're read, so each page of full org dictionaries
+    # can go as soon as it has been looked at.
+    matches = [(org['name'], org['id']) for org in org_list
+               if process_all or (org['name'].lower()).find(filter) != -1]
+
+    # Sort by org name, then add a number to make menu-making simpler
+    matches.sort(key=itemgetter(0))
+    return_list = [orgData(org_id, name, menu_num) for menu_num, (name, org_id) in enumerate(matches, 1)]
+
+    if len(return_list):
+        return(return_list)
+    else:
+        print_user_text(f'ERROR: No organizations matching: {filter}')
+        sys.exit(1)
+
+
+def choose_org(org_list):
+    '''
+    Print a menu, then return user's chosen organization.
+
+    :param org_list: List of orgData objects
+
+    :return: List containing the chosen orgData object.
+    '''
+
+    attempts = 0
+
+    while (attempts < 3):
+        attempts += 1
+        for org in org_list:
+            print(f'{org.menu}: {org.name}')
+        chosen_org = input("Enter Q to quit or select menu number: ").strip()
+
+        if chosen_org.lower() == 'q':
+            print("Quiting program...")
+            sys.exit()
+        elif chosen_org.isdigit():
+            for org in org_list:
+                if org.menu == int(chosen_org):
+                    return([org])
+        # If no org matches, print notice and ask again.
+        print(f'No matching menu item {chosen_org}\n')
+
+    print("No valid choice made. Exiting...")
+    sys.exit()
@@ -0,0 +1,143 @@
+'''
+Local SQLite inventory of organizations, networks and their product types.
+
+Picking target orgs and networks from the inventory takes no API calls. The
+org list and each org's network list are re-fetched only once they're older
+than the inventory's TTL, or when a refresh is forced.
+'''
+
+import sqlite3
+import time
+
+import meraki_client
+import meraki_common
+
+# Default inventory file, and how long its entries are trusted
+INVENTORY_FILE = 'meraki_inventory.sqlite'
+INVENTORY_TTL = 24 * 60 * 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS orgs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    networks_refreshed REAL
+);
+CREATE TABLE IF NOT EXISTS networks (
+    id TEXT PRIMARY KEY,
+    org_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    product_types TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS networks_org ON networks (org_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+'''
+
+
+class Inventory:
+    '''Orgs and networks cached in a SQLite file.'''
+
+    def __init__(self, path=INVENTORY_FILE, ttl=INVENTORY_TTL, force_refresh=False):
+        '''
+        :param path: SQLite file
+        :param ttl: Seconds before an org list or network list is re-fetched
+        :param force_refresh: Re-fetch everything used this run regardless of age
+        '''
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        self.ttl = ttl
+        self.force_refresh = force_refresh
+
+    def close(self):
+        self.db.close()
+
+    def _stale(self, refreshed):
+        return self.force_refresh or refreshed is None or time.time() - refreshed > self.ttl
+
+    def refresh_orgs(self, api_key):
+        '''
+        Re-fetch the org list if it's stale. Orgs that have gone away are dropped
+        along with their networks.
+
+        :param api_key: Meraki Dashboard API key
+
+        :return: None
+        '''
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'orgs_refreshed'").fetchone()
+        if not self._stale(row['value'] if row else None):
+            return
+
+        orgs = [(org['id'], org['name']) for org in meraki_client.paginate(api_key, '/organizations')]
+        with self.db:
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)')
+            self.db.execute('DELETE FROM seen')
+            self.db.executemany('INSERT OR IGNORE INTO seen (id) VALUES (?)', [(org_id,) for org_id, name in orgs])
+            self.db.execute('DELETE FROM networks WHERE org_id NOT IN (SELECT id FROM seen)')
+            self.db.execute('DELETE FROM orgs WHERE id NOT IN (SELECT id FROM seen)')
+            self.db.executemany('INSERT INTO orgs (id, name) VALUES (?, ?) '
+                                'ON CONFLICT (id) DO UPDATE SET name = excluded.name', orgs)
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('orgs_refreshed', ?)", (time.time(),))
+
+    def refresh_networks(self, api_key, org_id):
+        '''
+        Re-fetch an org's networks if they're stale.
+
+        :param api_key: Meraki Dashboard API key
+        :param org_id: Organization ID
+
+        :return: None
+        '''
+        row = self.db.execute('SELECT networks_refreshed FROM orgs WHERE id = ?', (org_id,)).fetchone()
+        if row is not None and not self._stale(row['networks_refreshed']):
+            return
+
+        networks = [(network['id'], org_id, network['name'], ','.join(network.get('productTypes') or []))
+                    for network in meraki_client.paginate(api_key, f'/organizations/{org_id}/networks',
+                                                          org_id=org_id, cache=False)]
+        with self.db:
+            self.db.execute('DELETE FROM networks WHERE org_id = ?', (org_id,))
+            self.db.executemany('INSERT OR REPLACE INTO networks (id, org_id, name, product_types) VALUES (?, ?, ?, ?)',
+                                networks)
+            self.db.execute('UPDATE orgs SET networks_refreshed = ? WHERE id = ?', (time.time(), org_id))
+
+    def get_orgs(self, api_key, name_filter='/all'):
+        '''
+        Return orgs whose name contains name_filter, refreshing the org list if stale.
+
+        :param api_key: Meraki Dashboard API key
+        :param name_filter: Case-insensitive part of an org name, or '/all'
+
+        :return: List of dictionaries with 'id' and 'name', sorted by name
+        '''
+        self.refresh_orgs(api_key)
+        if name_filter == '/all':
+            rows = self.db.execute('SELECT id, name FROM orgs ORDER BY name')
+        else:
+            rows = self.db.execute("SELECT id, name FROM orgs WHERE instr(lower(name), ?) > 0 ORDER BY name",
+                                   (name_filter.lower(),))
+        return [dict(row) for row in rows]
+
+    def get_networks(self, api_key, org_id, product_type=None):
+        '''
+        Return an org's networks, refreshing them if stale.
+
+        :param api_key: Meraki Dashboard API key
+        :param org_id: Organization ID
+        :param product_type: Only return networks with this product type, such as 'wireless'
+
+        :return: List of meraki_common.networkData objects
+        '''
+        self.refresh_networks(api_key, org_id)
+        if product_type:
+            rows = self.db.execute("SELECT id, name, product_types FROM networks WHERE org_id = ? "
+                                   "AND instr(',' || product_types || ',', ?) > 0 ORDER BY name",
+                                   (org_id, f',{product_type},'))
+        else:
+            rows = self.db.execute('SELECT id, name, product_types FROM networks WHERE org_id = ? ORDER BY name',
+                                   (org_id,))
+        return [meraki_common.networkData(row['id'], row['name'],
+                                          meraki_common.product_mask(row['product_types'].split(',')))
+                for row in rows]
@@ -0,0 +1,72 @@
+'''
+Append-only journal of completed work units, for resuming interrupted runs.
+
+Each line of the journal is a JSON list naming one finished unit, such as
+["rf-profile", org ID, network ID, profile name] or ["admin", org ID, email].
+A rerun with --resume loads the journal and skips units already in it.
+Lines are flushed as they're written, so a crash loses at most the unit in
+progress.
+'''
+
+import json
+import os
+import threading
+
+
+class Journal:
+    '''Completed work units, loaded from and appended to a file.'''
+
+    def __init__(self, path, resume=False):
+        '''
+        :param path: Journal file
+        :param resume: Load units already in the file. Otherwise the file is started fresh.
+        '''
+        self.path = path
+        self.done = set()
+        self.lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            with open(path, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        self.done.add(tuple(json.loads(line)))
+                    except ValueError:
+                        # A line cut short by a crash. Its unit will simply be redone.
+                        continue
+
+        self.file = open(path, 'a' if resume else 'w')
+
+    def __contains__(self, unit):
+        return tuple(unit) in self.done
+
+    def record(self, *unit):
+        '''
+        Record a finished unit.
+
+        :param unit: Values naming the unit
+
+        :return: None
+        '''
+        with self.lock:
+            if unit in self.done:
+                return
+            self.done.add(unit)
+            self.file.write(json.dumps(unit) + '\n')
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class nullJournal:
+    '''Stand-in used when no journal is wanted. Nothing is ever done.'''
+
+    def __contains__(self, unit):
+        return False
+
+    def record(self, *unit):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,250 @@
+'''
+Request-level metrics for Dashboard API calls.
+
+Once enable() has been called, meraki_client records every call here:
+endpoint, method, status, latency, bytes received, 429 retries and time spent
+waiting on the rate limiter, and a per-endpoint latency report is printed
+when the script exits. It can also be written as JSON or as a Prometheus
+textfile. Percentiles come from a fixed-size random sample of each
+endpoint's latencies, so a --watch run that never ends uses bounded memory.
+'''
+
+import atexit
+import json
+import random
+import threading
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+# Path segments that are followed by an ID. The ID is replaced with a
+# placeholder so calls for different orgs, networks or devices group together.
+ID_COLLECTIONS = ('organizations', 'networks', 'devices', 'admins', 'rfProfiles', 'switchPorts', 'actionBatches')
+
+PERCENTILES = (50, 95, 99)
+
+# Latencies kept per endpoint for percentiles. Beyond this a random sample is kept.
+LATENCY_SAMPLES = 10000
+
+enabled = False
+
+
+class endpointStats:
+    '''Running totals for one method and endpoint.'''
+
+    def __init__(self):
+        self.calls = 0
+        self.total_latency = 0.0
+        self.latencies = []
+        self.statuses = Counter()
+        self.bytes = 0
+        self.retries = 0
+        self.throttle_wait = 0.0
+
+
+_stats = defaultdict(endpointStats)
+_lock = threading.Lock()
+
+
+def endpoint_template(url):
+    '''
+    Turn a request URL into an endpoint name with IDs replaced.
+
+    :param url: Full request URL
+
+    :return: String such as '/organizations/{id}/networks'
+    '''
+    segments = urlsplit(url).path.split('/')
+    # Drop everything up to and including the API version.
+    for n, segment in enumerate(segments):
+        if segment.startswith('v') and segment[1:].isdigit():
+            segments = segments[n + 1:]
+            break
+    for n in range(1, len(segments)):
+        if segments[n - 1] in ID_COLLECTIONS and segments[n]:
+            segments[n] = '{id}'
+    return '/' + '/'.join(segment for segment in segments if segment)
+
+
+def record(method, url, status, latency, size, retries=0, throttle_wait=0.0):
+    '''
+    Record one Dashboard call.
+
+    :param method: HTTP method
+    :param url: Full request URL
+    :param status: HTTP status code of the final response
+    :param latency: Seconds spent on the HTTP exchange, summed across retries
+    :param size: Bytes in the response body
+    :param retries: Number of 429 retries
+    :param throttle_wait: Seconds spent waiting on the rate limiter
+
+    :return: None
+    '''
+    if not enabled:
+        return
+    key = (method, endpoint_template(url))
+    with _lock:
+        stats = _stats[key]
+        stats.calls += 1
+        stats.total_latency += latency
+        # Reservoir sampling: every call has the same chance of being in the sample.
+        if len(stats.latencies) < LATENCY_SAMPLES:
+            stats.latencies.append(latency)
+        else:
+            slot = random.randrange(stats.calls)
+            if slot < LATENCY_SAMPLES:
+                stats.latencies[slot] = latency
+        stats.statuses[status] += 1
+        stats.bytes += size
+        stats.retries += retries
+        stats.throttle_wait += throttle_wait
+
+
+def drain():
+    '''
+    Take everything recorded so far and start again from nothing. Worker
+    processes use this to hand their metrics back to the parent.
+
+    :return: Dictionary of (method, endpoint) to endpointStats
+    '''
+    global _stats
+    with _lock:
+        stats, _stats = dict(_stats), defaultdict(endpointStats)
+    return stats
+
+
+def merge(stats):
+    '''
+    Add metrics recorded elsewhere, such as by a worker process.
+
+    :param stats: Dictionary returned by drain()
+
+    :return: None
+    '''
+    with _lock:
+        for key, other in stats.items():
+            mine = _stats[key]
+            mine.calls += other.calls
+            mine.total_latency += other.total_latency
+            mine.latencies += other.latencies
+            if len(mine.latencies) > LATENCY_SAMPLES:
+                mine.latencies = random.sample(mine.latencies, LATENCY_SAMPLES)
+            mine.statuses.update(other.statuses)
+            mine.bytes += other.bytes
+            mine.retries += other.retries
+            mine.throttle_wait += other.throttle_wait
+
+
+def percentile(values, pct):
+    '''
+    Nearest-rank percentile.
+
+    :param values: Sorted list of numbers
+    :param pct: Percentile from 0 to 100
+
+    :return: Value at that percentile, or 0.0 for an empty list
+    '''
+    if not values:
+        return 0.0
+    rank = max(1, -(-pct * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def summary():
+    '''
+    Summarize everything recorded so far.
+
+    :return: List of dictionaries, one per method and endpoint, busiest first
+    '''
+    report = []
+    with _lock:
+        for (method, endpoint), stats in _stats.items():
+            latencies = sorted(stats.latencies)
+            entry = {'method': method, 'endpoint': endpoint, 'calls': stats.calls,
+                     'statuses': {str(status): count for status, count in stats.statuses.items()},
+                     'bytes': stats.bytes, 'retries': stats.retries,
+                     'throttle_wait_seconds': round(stats.throttle_wait, 4),
+                     'total_seconds': round(stats.total_latency, 4)}
+            for pct in PERCENTILES:
+                entry[f'p{pct}_seconds'] = round(percentile(latencies, pct), 4)
+            report.append(entry)
+    report.sort(key=lambda entry: entry['total_seconds'] + entry['throttle_wait_seconds'], reverse=True)
+    return report
+
+
+def format_report(report):
+    '''
+    Format a summary as a text table.
+
+    :param report: List returned by summary()
+
+    :return: String
+    '''
+    lines = [f'{"method":6} {"endpoint":45} {"calls":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+             f'{"KB":>8} {"retries":>7} {"wait s":>8}']
+    for entry in report:
+        lines.append(f'{entry["method"]:6} {entry["endpoint"]:45} {entry["calls"]:6d} '
+                     f'{entry["p50_seconds"] * 1000:8.1f} {entry["p95_seconds"] * 1000:8.1f} '
+                     f'{entry["p99_seconds"] * 1000:8.1f} {entry["bytes"] / 1024:8.1f} '
+                     f'{entry["retries"]:7d} {entry["throttle_wait_seconds"]:8.2f}')
+    return '\n'.join(lines)
+
+
+def write_json(path, report):
+    '''Write a summary to a file as JSON.'''
+    with open(path, 'w') as json_file:
+        json.dump(report, json_file, indent=2)
+
+
+def write_prometheus(path, report):
+    '''
+    Write a summary in the Prometheus textfile collector format.
+
+    :param path: File to write
+    :param report: List returned by summary()
+
+    :return: None
+    '''
+    lines = ['# TYPE meraki_api_requests_total counter',
+             '# TYPE meraki_api_request_seconds summary',
+             '# TYPE meraki_api_response_bytes_total counter',
+             '# TYPE meraki_api_retries_total counter',
+             '# TYPE meraki_api_throttle_wait_seconds_total counter']
+    for entry in report:
+        labels = f'method="{entry["method"]}",endpoint="{entry["endpoint"]}"'
+        for status, count in entry['statuses'].items():
+            lines.append(f'meraki_api_requests_total{{{labels},status="{status}"}} {count}')
+        for pct in PERCENTILES:
+            lines.append(f'meraki_api_request_seconds{{{labels},quantile="{pct / 100}"}} {entry[f"p{pct}_seconds"]}')
+        lines.append(f'meraki_api_request_seconds_sum{{{labels}}} {entry["total_seconds"]}')
+        lines.append(f'meraki_api_request_seconds_count{{{labels}}} {entry["calls"]}')
+        lines.append(f'meraki_api_response_bytes_total{{{labels}}} {entry["bytes"]}')
+        lines.append(f'meraki_api_retries_total{{{labels}}} {entry["retries"]}')
+        lines.append(f'meraki_api_throttle_wait_seconds_total{{{labels}}} {entry["throttle_wait_seconds"]}')
+    with open(path, 'w') as prom_file:
+        prom_file.write('\n'.join(lines) + '\n')
+
+
+def enable(print_report=True, json_path=None, prom_path=None):
+    '''
+    Start recording, and report metrics when the script exits.
+
+    :param print_report: Print the text table
+    :param json_path: Also write the report as JSON to this file
+    :param prom_path: Also write the report as a Prometheus textfile to this file
+
+    :return: None
+    '''
+    global enabled
+    enabled = True
+
+    def report_at_exit():
+        report = summary()
+        if print_report:
+            print('')
+            print(format_report(report))
+        if json_path:
+            write_json(json_path, report)
+        if prom_path:
+            write_prometheus(prom_path, report)
+
+    atexit.register(report_at_exit)
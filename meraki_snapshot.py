@@ -0,0 +1,216 @@
+'''
+Content-addressed snapshot store for switchport configs.
+
+Each distinct port config (everything but the port number) is stored once,
+under the SHA-256 of its canonical JSON, in objects/. A snapshot in
+snapshots/ records only the ports whose config hash changed since the
+snapshot before it, so a nightly backup of a fleet that barely changes is a
+few lines. HEAD names the latest snapshot. A snapshot's full state is
+rebuilt by replaying the chain of changes up to it.
+
+store/
+    HEAD
+    objects/ab/ab12...json
+    snapshots/20240101T000000Z.json
+'''
+
+import hashlib
+import json
+import os
+import time
+
+import meraki_client
+
+
+def _write_atomic(path, data):
+    '''Write bytes to path so readers never see a partial file.'''
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def canonical_json(config):
+    '''
+    Encode a port config the same way every time, for its content address.
+
+    Always the standard json module with ASCII escapes, never orjson, so a
+    config keeps its digest whether or not orjson is installed.
+
+    :return: Bytes
+    '''
+    return json.dumps(config, sort_keys=True, separators=(',', ':'), ensure_ascii=True).encode()
+
+
+class SnapshotStore:
+    '''Switchport snapshots kept in a directory.'''
+
+    def __init__(self, path):
+        '''
+        :param path: Store directory. Created if it doesn't exist.
+        '''
+        self.path = path
+        self.objects_path = os.path.join(path, 'objects')
+        self.snapshots_path = os.path.join(path, 'snapshots')
+        os.makedirs(self.objects_path, exist_ok=True)
+        os.makedirs(self.snapshots_path, exist_ok=True)
+        self._states = {}
+
+    def put_object(self, config):
+        '''
+        Store a port config unless an identical one is already stored.
+
+        :param config: Dictionary of port settings, without the port number
+
+        :return: Hex digest the config is stored under
+        '''
+        encoded = canonical_json(config)
+        digest = hashlib.sha256(encoded).hexdigest()
+        directory = os.path.join(self.objects_path, digest[:2])
+        path = os.path.join(directory, f'{digest}.json')
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            _write_atomic(path, encoded)
+        return digest
+
+    def get_object(self, digest):
+        '''
+        :param digest: Hex digest returned by put_object
+
+        :return: Dictionary of port settings
+        '''
+        with open(os.path.join(self.objects_path, digest[:2], f'{digest}.json'), 'rb') as object_file:
+            return json.loads(object_file.read())
+
+    def head(self):
+        '''
+        :return: ID of the latest snapshot, or None if there are none
+        '''
+        try:
+            with open(os.path.join(self.path, 'HEAD'), 'r') as head_file:
+                return head_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, snapshot_id):
+        '''
+        :param snapshot_id: Snapshot ID
+
+        :return: Dictionary with 'id', 'parent', 'created' and 'changes'
+        '''
+        with open(os.path.join(self.snapshots_path, f'{snapshot_id}.json'), 'r') as snapshot_file:
+            return json.load(snapshot_file)
+
+    def snapshots(self):
+        '''
+        :return: List of snapshot IDs from oldest to newest, following the chain back from HEAD
+        '''
+        chain = []
+        snapshot_id = self.head()
+        while snapshot_id:
+            chain.append(snapshot_id)
+            snapshot_id = self.load(snapshot_id)['parent']
+        return chain[::-1]
+
+    def resolve(self, snapshot_id):
+        '''
+        Rebuild the full state as of a snapshot.
+
+        :param snapshot_id: Snapshot ID, such as head() or a snapshot's parent. None,
+            the parent of the first snapshot, is the empty state before any snapshot.
+
+        :return: Dictionary of serial to dictionary of port number to config digest
+        '''
+        if snapshot_id is None:
+            return {}
+
+        # Walk back to the last state already rebuilt, then replay forward.
+        chain = []
+        parent = snapshot_id
+        while parent and parent not in self._states:
+            snapshot = self.load(parent)
+            chain.append(snapshot)
+            parent = snapshot['parent']
+        state = self._states.get(parent, {})
+
+        for snapshot in reversed(chain):
+            # Only switches that changed are copied; the rest are shared with the parent's state.
+            state = dict(state)
+            for serial, ports in snapshot['changes'].items():
+                switch = dict(state.get(serial, {}))
+                for number, digest in ports.items():
+                    if digest is None:
+                        switch.pop(number, None)
+                    else:
+                        switch[number] = digest
+                state[serial] = switch
+            self._states[snapshot['id']] = state
+        return self._states[snapshot_id]
+
+    def diff(self, old_state, new_state):
+        '''
+        Compare two states from resolve().
+
+        :return: Generator of (serial, port number, old digest, new digest) tuples.
+            A digest is None where the port doesn't exist on that side.
+        '''
+        for serial in sorted(set(old_state) | set(new_state)):
+            old_ports = old_state.get(serial, {})
+            new_ports = new_state.get(serial, {})
+            for number in sorted(set(old_ports) | set(new_ports), key=lambda number: (len(number), number)):
+                if old_ports.get(number) != new_ports.get(number):
+                    yield serial, number, old_ports.get(number), new_ports.get(number)
+
+    def commit(self, switches):
+        '''
+        Record a new snapshot from freshly exported switches. Switches not
+        given keep their state from the previous snapshot.
+
+        :param switches: Iterable of (serial, list of port dictionaries) tuples
+
+        :return: Tuple of (snapshot ID or None if nothing changed, number of ports changed)
+        '''
+        parent = self.head()
+        previous = self.resolve(parent)
+        changes = {}
+        changed = 0
+
+        for serial, ports in switches:
+            current = {}
+            for port in ports:
+                config = {key: value for key, value in port.items() if key != 'number'}
+                current[str(port['number'])] = self.put_object(config)
+            old_ports = previous.get(serial, {})
+            switch_changes = {number: digest for number, digest in current.items() if old_ports.get(number) != digest}
+            switch_changes.update({number: None for number in old_ports if number not in current})
+            if switch_changes:
+                changes[serial] = switch_changes
+                changed += len(switch_changes)
+
+        if not changes:
+            return None, 0
+
+        snapshot_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+        suffix = 1
+        while os.path.exists(os.path.join(self.snapshots_path, f'{snapshot_id}.json')):
+            suffix += 1
+            snapshot_id = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{suffix}"
+
+        snapshot = {'id': snapshot_id, 'parent': parent, 'created': time.time(), 'changes': changes}
+        _write_atomic(os.path.join(self.snapshots_path, f'{snapshot_id}.json'),
+                      meraki_client.encode_json(snapshot, sort_keys=True))
+        _write_atomic(os.path.join(self.path, 'HEAD'), snapshot_id.encode() + b'\n')
+        return snapshot_id, changed
+
+    def ports(self, state, serial):
+        '''
+        Expand one switch from a state back into full port configs.
+
+        :param state: Dictionary returned by resolve()
+        :param serial: Switch serial number
+
+        :return: List of port dictionaries in port order
+        '''
+        switch = state.get(serial, {})
+        return [dict(self.get_object(switch[number]), number=number)
+                for number in sorted(switch, key=lambda number: (len(number), number))]
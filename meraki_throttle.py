@@ -0,0 +1,160 @@
+'''
+Per-organization token-bucket rate limiting for Dashboard API calls.
+
+Dashboard budgets API calls per organization, so each org gets its own bucket.
+Calls that can't be tied to an org share the default bucket. A 429 response
+blocks the org's bucket for the Retry-After period and halves its rate, once
+per block however many calls in flight come back 429. Successful calls
+afterwards grow the rate back by RATE_RECOVERY_FACTOR per second.
+'''
+
+import threading
+import time
+
+# Dashboard allows 10 calls per second per organization, with a small burst.
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+
+# Lowest rate adaptive backoff will drop a bucket to, in calls per second
+MIN_RATE = 1.0
+
+# Factor the rate grows by per second of successful calls after a 429, back
+# up to the full rate. 1.5 recovers from one halving in under two seconds.
+RATE_RECOVERY_FACTOR = 1.5
+
+# Seconds to wait after a 429 that carries no usable Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+# Bucket key for calls that aren't tied to an organization
+DEFAULT_KEY = None
+
+
+class TokenBucket:
+    '''Thread-safe token bucket with adaptive rate for one organization.'''
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.recovered = self.updated
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        '''
+        Block until a token is available, then take it.
+
+        :return: Seconds spent waiting
+        '''
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self, retry_after):
+        '''
+        Record a 429: block the bucket and halve its rate. 429s that arrive
+        while the bucket is already blocked come from the same burst of calls
+        and don't halve it again.
+
+        :param retry_after: Seconds Dashboard asked us to wait
+
+        :return: None
+        '''
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.blocked_until:
+                self.rate = max(MIN_RATE, self.rate / 2)
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.recovered = now
+            self.tokens = 0.0
+            self.updated = now
+
+    def succeeded(self):
+        '''
+        Record a successful call and grow the rate back by RATE_RECOVERY_FACTOR
+        for each second since the last 429 or recovery.
+
+        :return: None
+        '''
+        if self.rate < self.max_rate:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                self.rate = min(self.max_rate, self.rate * RATE_RECOVERY_FACTOR ** (now - self.recovered))
+                self.recovered = now
+
+
+class RateLimiter:
+    '''Token buckets keyed by organization ID.'''
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, key=DEFAULT_KEY):
+        '''
+        Return the bucket for an organization, creating it on first use.
+
+        :param key: Organization ID, or None for the default bucket
+
+        :return: TokenBucket object
+        '''
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.setdefault(key, TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def acquire(self, key=DEFAULT_KEY):
+        '''
+        Wait for a token from an organization's bucket.
+
+        :param key: Organization ID, or None for the default bucket
+
+        :return: Seconds spent waiting
+        '''
+        return self.bucket(key).acquire()
+
+    def throttled(self, key=DEFAULT_KEY, retry_after=DEFAULT_RETRY_AFTER):
+        '''Record a 429 against an organization's bucket.'''
+        self.bucket(key).throttled(retry_after)
+
+    def succeeded(self, key=DEFAULT_KEY):
+        '''Record a successful call against an organization's bucket.'''
+        self.bucket(key).succeeded()
+
+
+def parse_retry_after(value, attempt=0):
+    '''
+    Turn a Retry-After header into seconds to wait.
+
+    :param value: Retry-After header value, or None
+    :param attempt: Number of 429s already seen for this call, used when the header is missing
+
+    :return: Seconds to wait as a float
+    '''
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        # Missing or an HTTP date: fall back to exponential backoff.
+        seconds = DEFAULT_RETRY_AFTER * (2 ** attempt)
+    return max(seconds, 0.0)
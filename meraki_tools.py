@@ -0,0 +1,60 @@
+'''
+One entry point for the scripts in this repo:
+
+python meraki_tools.py rf-profiles -o <org name>
+python meraki_tools.py admins -o <org name>
+python meraki_tools.py switchports -k <api key> -o <org name> -m export
+
+Everything after the subcommand is passed to that script unchanged, so each
+subcommand takes the same options as running its script directly. Only the
+script for the chosen subcommand is imported, and the scripts import
+requests, cProfile and worker pools only when they are used, so -h and bad
+arguments return straight away. benchmark.py --startup checks this stays
+under STARTUP_BUDGET.
+'''
+
+import importlib
+import sys
+
+# Subcommand to (module, summary)
+COMMANDS = {
+    'rf-profiles': ('add_standard_rf_profiles', 'Push the standard RF profiles to wireless networks.'),
+    'admins': ('add_standard_admins', 'Copy the standard org\'s admins to other orgs.'),
+    'switchports': ('import-exportSwitchPorts', 'Export, import, snapshot or restore switchport configs.'),
+}
+
+# Seconds a subcommand may take to print its help, checked by benchmark.py --startup
+STARTUP_BUDGET = 0.15
+
+
+def print_help():
+    '''
+    Print help text.
+
+    :return: None
+    '''
+    print('Usage: python meraki_tools.py <command> [options]')
+    print('')
+    print('Commands:')
+    for command, (module_name, summary) in COMMANDS.items():
+        print(f'  {command:<13}{summary}')
+    print('')
+    print('Run python meraki_tools.py <command> -h for a command\'s options.')
+
+
+def main(argv):
+    if not argv or argv[0] in ('-h', '--help'):
+        print_help()
+        sys.exit()
+
+    if argv[0] not in COMMANDS:
+        print(f'Unknown command: {argv[0]}\n')
+        print_help()
+        sys.exit(2)
+
+    module = importlib.import_module(COMMANDS[argv[0]][0])
+    module.main(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
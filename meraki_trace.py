@@ -0,0 +1,204 @@
+'''
+Timeline tracing and profiling for --profile.
+
+When enabled, meraki_client records a span for every HTTP exchange and every
+wait on the rate limiter, and the scripts add spans around each network, org
+or switch they work on. The spans are written at exit in the Chrome trace
+event format, which chrome://tracing and https://ui.perfetto.dev open as a
+per-thread timeline. cProfile stats for every thread can be written
+alongside, for `python -m pstats` or snakeviz.
+
+Nothing is recorded until enable() is called.
+'''
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+enabled = False
+
+_events = []
+_lock = threading.Lock()
+_profilers = []
+_epoch = time.perf_counter()
+
+
+def _micros(seconds):
+    return round((seconds - _epoch) * 1000000, 1)
+
+
+def add_span(name, category, start, end, **args):
+    '''
+    Record a span that has already finished.
+
+    :param name: Span name, such as 'GET /networks/{id}/wireless/rfProfiles'
+    :param category: Span category, such as 'http' or 'throttle'
+    :param start: time.perf_counter() at the start of the span
+    :param end: time.perf_counter() at the end of the span
+    :param args: Extra details shown with the span
+
+    :return: None
+    '''
+    if not enabled:
+        return
+    event = {'name': name, 'cat': category, 'ph': 'X', 'ts': _micros(start),
+             'dur': round((end - start) * 1000000, 1), 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args}
+    with _lock:
+        _events.append(event)
+
+
+@contextmanager
+def span(name, category='unit', **args):
+    '''
+    Record a span around a block of work.
+
+    with meraki_trace.span(network.name, 'network'):
+        ...
+    '''
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, category, start, time.perf_counter(), **args)
+
+
+def drain():
+    '''
+    Take every span recorded so far. Worker processes use this to hand their
+    spans back to the parent.
+
+    :return: List of trace events
+    '''
+    global _events
+    with _lock:
+        events, _events = _events, []
+    return events
+
+
+def merge(events):
+    '''Add spans recorded elsewhere, such as by a worker process.'''
+    with _lock:
+        _events.extend(events)
+
+
+def write_trace(path):
+    '''
+    Write the recorded spans as a Chrome trace, naming each thread.
+
+    :param path: File to write
+
+    :return: None
+    '''
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    with _lock:
+        events = list(_events)
+    threads = {(event['pid'], event['tid']) for event in events}
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                 'args': {'name': names.get(tid, f'thread {tid}') if pid == os.getpid() else f'worker {pid}'}}
+                for pid, tid in threads]
+    with open(path, 'w') as trace_file:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, trace_file)
+
+
+def _profile_thread(frame, event, arg):
+    # Runs as the first profile callback in each new thread and swaps in a
+    # cProfile profiler of the thread's own.
+    import cProfile
+
+    profiler = cProfile.Profile()
+    with _lock:
+        _profilers.append(profiler)
+    profiler.enable()
+
+
+def start_profiler():
+    '''
+    Start cProfile on this thread and every thread started afterwards.
+
+    :return: None
+    '''
+    # cProfile and pstats are only imported when profiling, to keep startup fast.
+    import cProfile
+
+    profiler = cProfile.Profile()
+    _profilers.append(profiler)
+    profiler.enable()
+    if sys.version_info < (3, 12):
+        # Before 3.12 a profiler only sees the thread that enabled it.
+        threading.setprofile(_profile_thread)
+
+
+def write_profile(path):
+    '''
+    Stop profiling and write the combined stats of every profiled thread.
+
+    :param path: File to write, readable with pstats
+
+    :return: None
+    '''
+    import pstats
+
+    threading.setprofile(None)
+    with _lock:
+        profilers = list(_profilers)
+    for profiler in profilers:
+        profiler.disable()
+    stats = pstats.Stats(profilers[0])
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    stats.dump_stats(path)
+
+
+def worker_args():
+    '''
+    :return: Arguments for init_worker() that carry this process's tracing state to a worker process
+    '''
+    return enabled, _epoch
+
+
+def init_worker(trace_enabled, epoch):
+    '''
+    Set up tracing in a worker process to match its parent. Spawned workers
+    (the default on Windows and macOS) start from a fresh import and don't
+    inherit it. Workers hand their spans back with drain() rather than
+    writing them at exit.
+
+    :param trace_enabled: Whether the parent is recording
+    :param epoch: The parent's time origin, so worker spans line up with its own
+
+    :return: None
+    '''
+    global enabled, _epoch
+    enabled = trace_enabled
+    _epoch = epoch
+
+
+def enable(trace_path, profile_path=None):
+    '''
+    Start recording, and write the trace (and cProfile stats) when the script exits.
+
+    :param trace_path: File for the Chrome trace
+    :param profile_path: File for cProfile stats, or None to skip profiling
+
+    :return: None
+    '''
+    global enabled
+    enabled = True
+    if profile_path:
+        start_profiler()
+
+    def write_at_exit():
+        write_trace(trace_path)
+        print(f'Trace written to {trace_path}. Open it in chrome://tracing or https://ui.perfetto.dev')
+        if profile_path:
+            write_profile(profile_path)
+            print(f'Profile written to {profile_path}. Read it with python -m pstats {profile_path}')
+
+    atexit.register(write_at_exit)
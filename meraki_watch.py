@@ -0,0 +1,176 @@
+'''
+Building blocks for --watch drift detection.
+
+A ResourceWatcher polls Dashboard resources with If-None-Match, so a
+resource that hasn't changed comes back as an empty 304. When Dashboard
+doesn't send an ETag, a hash of the previous body is compared instead and
+the resource is still treated as unchanged. Only changed resources need
+checking again. Paginated listings are polled page by page, following
+Link: rel=next. A DriftTracker remembers the problems last found for each
+subject and reports only what appeared or cleared since.
+'''
+
+import hashlib
+import threading
+import time
+
+import meraki_client
+
+
+class watchedResource:
+    '''What was seen the last time a resource was polled.'''
+
+    def __init__(self, etag, digest, data, next_url=None):
+        self.etag = etag
+        self.digest = digest
+        self.data = data
+        self.next_url = next_url
+
+
+class ResourceWatcher:
+    '''Polls resources and says whether each has changed since the last poll.'''
+
+    def __init__(self):
+        self.seen = {}
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def poll(self, api_key, path, org_id=None, project=None):
+        '''
+        Fetch a resource unless it's unchanged since the last poll.
+
+        :param api_key: Meraki Dashboard API key
+        :param path: API path of the resource
+        :param org_id: Organization ID the call counts against, for rate limiting
+        :param project: Function applied to the parsed body, such as
+            meraki_common.parse_networks. Only its result is kept between polls.
+
+        :return: Tuple of (True if changed or polled for the first time, parsed JSON body or projection)
+        '''
+        changed, seen = self._poll(api_key, path, None, org_id, project)
+        return changed, seen.data
+
+    def poll_listing(self, api_key, path, org_id=None, project=None, per_page=None):
+        '''
+        Poll every page of a paginated listing, following Link: rel=next.
+
+        Each page is its own conditional GET, so an unchanged listing costs one
+        empty 304 per page. A page that comes back 304 is followed to the next
+        page it linked to last time.
+
+        :param api_key: Meraki Dashboard API key
+        :param path: API path of the listing, such as '/organizations/{id}/networks'
+        :param org_id: Organization ID the calls count against, for rate limiting
+        :param project: Function applied to each page's parsed body, such as meraki_common.parse_networks
+        :param per_page: Number of items to request per page, or None for the server default
+
+        :return: Tuple of (True if any page changed or pages were added or dropped, list of items from every page)
+        '''
+        changed = False
+        items = []
+        pages = []
+        url, params = path, ({'perPage': per_page} if per_page else None)
+        while url:
+            page_changed, seen = self._poll(api_key, url, params, org_id, project)
+            changed = changed or page_changed
+            items.extend(seen.data)
+            pages.append((url, params))
+            # The next link already carries the paging query string.
+            url, params = seen.next_url, None
+
+        with self.lock:
+            if self.listings.get(path) != pages:
+                self.listings[path] = pages
+                changed = True
+        return changed, items
+
+    def _poll(self, api_key, path, params, org_id, project):
+        '''
+        Conditional GET of one resource or page.
+
+        :return: Tuple of (True if changed or polled for the first time, watchedResource)
+        '''
+        key = (path, tuple(sorted((params or {}).items())))
+        with self.lock:
+            seen = self.seen.get(key)
+
+        headers = {'If-None-Match': seen.etag} if seen and seen.etag else None
+        r = meraki_client.request(api_key, 'GET', path, params=params, org_id=org_id, headers=headers, cache=False)
+        if r.status_code == 304 and seen:
+            return False, seen
+        if not r.ok:
+            raise meraki_client.APIError(r)
+
+        next_url = r.links.get('next', {}).get('url')
+        digest = hashlib.sha256(r.content).digest()
+        if seen and seen.digest == digest:
+            seen.etag = r.headers.get('ETag')
+            seen.next_url = next_url
+            return False, seen
+
+        data = project(r.json()) if project else r.json()
+        seen = watchedResource(r.headers.get('ETag'), digest, data, next_url)
+        with self.lock:
+            self.seen[key] = seen
+        return True, seen
+
+
+class DriftTracker:
+    '''Remembers the problems found for each subject between checks.'''
+
+    def __init__(self):
+        self.problems = {}
+        self.lock = threading.Lock()
+
+    def update(self, subject, problems):
+        '''
+        Record the problems now found for a subject.
+
+        :param subject: Hashable name for what was checked, such as (org ID, network ID)
+        :param problems: Dictionary of problem key, such as a profile name, to description
+
+        :return: List of ('drift', key, description) and ('resolved', key, previous description) tuples
+        '''
+        with self.lock:
+            previous = self.problems.get(subject, {})
+            self.problems[subject] = problems
+        events = [('drift', key, description) for key, description in problems.items()
+                  if previous.get(key) != description]
+        events += [('resolved', key, description) for key, description in previous.items() if key not in problems]
+        return events
+
+
+def format_event(where, event, key, description):
+    '''
+    Format a drift event as one line with a UTC timestamp.
+
+    :param where: Human-readable name of the subject, such as 'Org: Network'
+
+    :return: String
+    '''
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    if event == 'drift':
+        return f'{stamp} DRIFT {where}: {key} {description}'
+    return f'{stamp} RESOLVED {where}: {key}'
+
+
+def run_every(interval, cycle, cycles=None):
+    '''
+    Call cycle() every interval seconds until interrupted.
+
+    :param interval: Seconds from the start of one cycle to the start of the next
+    :param cycle: Function taking the cycle number, starting at 1
+    :param cycles: Stop after this many cycles. None runs until Ctrl-C.
+
+    :return: None
+    '''
+    count = 0
+    try:
+        while cycles is None or count < cycles:
+            count += 1
+            start = time.monotonic()
+            cycle(count)
+            if cycles is None or count < cycles:
+                time.sleep(max(0.0, interval - (time.monotonic() - start)))
+    except KeyboardInterrupt:
+        print('\nStopped watching.')
@@ -0,0 +1,69 @@
+'''
+Process pool that spreads organizations across worker processes.
+
+Dashboard's rate limit is per organization, so orgs can be worked on in
+parallel without sharing a budget. Each worker process handles whole orgs
+with its own connection pool and rate limiter, and hands back its output
+lines, result counts, API metrics and trace spans, which are merged in the
+parent.
+'''
+
+from collections import Counter
+
+import meraki_client
+import meraki_metrics
+import meraki_trace
+
+
+def _init_worker(initializer, initargs, metrics_enabled, trace_args):
+    # Spawned workers start from a fresh import, so --metrics and --profile are
+    # passed in rather than inherited as they are when forked.
+    meraki_metrics.enabled = metrics_enabled
+    meraki_trace.init_worker(*trace_args)
+    # Forked workers start with a copy of the parent's metrics and spans. Drop
+    # them so they aren't counted twice when the worker's are merged back.
+    meraki_metrics.drain()
+    meraki_trace.drain()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_worker(worker, org):
+    try:
+        lines, results = worker(org)
+    except Exception as e:
+        lines, results = [f"ERROR: {org.name} failed: {e}"], Counter(failed=1)
+    return lines, results, meraki_metrics.drain(), meraki_trace.drain()
+
+
+def run_orgs(orgs, worker, processes, initializer=None, initargs=()):
+    '''
+    Run worker(org) for every org in a pool of processes.
+
+    worker and initializer must be module-level functions so they can be
+    sent to the workers. initializer runs once in each worker, before any
+    orgs, and is where per-process state such as the API key is set up.
+
+    :param orgs: List of orgData objects
+    :param worker: Function taking an orgData and returning (list of output lines, Counter of results)
+    :param processes: Number of worker processes
+    :param initializer: Function run once in each worker process, or None
+    :param initargs: Arguments for initializer
+
+    :return: Generator of (orgData, list of output lines, Counter of results) as each org finishes
+    '''
+    # Imported here so runs without --processes don't pay for loading multiprocessing.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    # Workers must open their own connections rather than share the parent's sockets.
+    meraki_client.close()
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(initializer, initargs, meraki_metrics.enabled,
+                                       meraki_trace.worker_args())) as executor:
+        futures = {executor.submit(_run_worker, worker, org): org for org in orgs}
+        for future in as_completed(futures):
+            lines, results, stats, events = future.result()
+            meraki_metrics.merge(stats)
+            meraki_trace.merge(events)
+            yield futures[future], lines, results
@@ -0,0 +1,395 @@
+'''
+Local stand-in for the parts of the Meraki Dashboard API the scripts use.
+
+Serves organizations, networks, admins, RF profiles, devices, switch ports and
+action batches from synthetic in-memory data, with configurable latency,
+injected 429s, ETags and Link header pagination. Used by benchmark.py, and handy for
+trying the scripts without touching a real org:
+
+python mock_dashboard.py --orgs 3 --networks 500 --latency 0.05
+
+then point the scripts at it with MERAKI_BASE_URL=http://127.0.0.1:8080/api/v0
+'''
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+API_PREFIX = '/api/v0'
+
+# Org ID the synthetic standard admins live in
+STANDARD_ORG_ID = 'standard'
+
+
+@dataclass
+class mockConfig:
+    '''Settings for the synthetic data and server behaviour.'''
+
+    orgs: int = 3
+    networks: int = 100
+    switches: int = 4
+    ports: int = 48
+    admins: int = 5
+    latency: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 0.1
+    per_page: int = 1000
+
+
+class MockDashboard:
+    '''In-memory Dashboard data plus call counters.'''
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.throttled = 0
+        self.ids = itertools.count(1)
+
+        self.orgs = [{'id': f'{n:06d}', 'name': f'Org {n:04d}'} for n in range(1, config.orgs + 1)]
+        self.networks = {}
+        self.rf_profiles = {}
+        self.devices = {}
+        self.switch_ports = {}
+        self.admins = {STANDARD_ORG_ID: [self.new_admin(n, 'full') for n in range(config.admins)]}
+        self.action_batches = {}
+
+        for org in self.orgs:
+            networks = []
+            for n in range(config.networks):
+                # Every fourth network is switch-only, so has no wireless.
+                product_types = ['switch'] if n % 4 == 3 else ['wireless', 'switch']
+                network = {'id': f"N_{org['id']}_{n:05d}", 'organizationId': org['id'],
+                           'name': f"{org['name']} Network {n:05d}", 'productTypes': product_types}
+                networks.append(network)
+                self.rf_profiles[network['id']] = []
+            self.networks[org['id']] = networks
+
+            devices = []
+            for n in range(config.switches):
+                serial = f"Q2SW-{org['id'][-4:]}-{n:04d}"
+                devices.append({'serial': serial, 'model': 'MS225-48', 'networkId': networks[0]['id'] if networks else None})
+                self.switch_ports[serial] = {str(p): self.new_port(p) for p in range(1, config.ports + 1)}
+            self.devices[org['id']] = devices
+
+            # Half of the standard admins already exist in each org.
+            self.admins[org['id']] = [dict(admin, id=str(next(self.ids)))
+                                      for admin in self.admins[STANDARD_ORG_ID][::2]]
+
+    def new_admin(self, n, access):
+        return {'id': str(next(self.ids)), 'name': f'Admin {n}', 'email': f'admin{n}@example.com', 'orgAccess': access}
+
+    def find_rf_profile(self, network, profile):
+        for existing in self.rf_profiles.get(network, []):
+            if existing['id'] == profile:
+                return existing
+        return None
+
+    def find_resource(self, resource):
+        '''Return the stored object an action batch resource path refers to, or None.'''
+        match = re.fullmatch(r'/devices/([^/]+)/switchPorts/([^/]+)', resource)
+        if match:
+            return self.switch_ports.get(match.group(1), {}).get(match.group(2))
+        match = re.fullmatch(r'/networks/([^/]+)/wireless/rfProfiles/([^/]+)', resource)
+        if match:
+            return self.find_rf_profile(*match.groups())
+        return None
+
+    @staticmethod
+    def new_port(number):
+        return {'number': number, 'name': None, 'tags': None, 'enabled': True, 'poeEnabled': True,
+                'type': 'access', 'vlan': 1, 'voiceVlan': None, 'allowedVlans': 'all',
+                'isolationEnabled': False, 'rstpEnabled': True, 'stpGuard': 'disabled'}
+
+
+def _page(items, query, url, default_per_page):
+    '''Return one page of items and the Link header for the next page, if any.'''
+    per_page = int(query.get('perPage', [default_per_page])[0])
+
+    start = 0
+    starting_after = query.get('startingAfter', [None])[0]
+    if starting_after is not None:
+        for n, item in enumerate(items):
+            if str(item.get('id', item.get('serial'))) == starting_after:
+                start = n + 1
+                break
+    page = items[start:start + per_page]
+    if start + per_page >= len(items) or not page:
+        return page, None
+
+    last = page[-1]
+    next_query = urlencode({'perPage': per_page, 'startingAfter': last.get('id', last.get('serial'))})
+    return page, f'<{url}?{next_query}>; rel=next'
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    '''Routes requests to the MockDashboard held by the server.'''
+
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body go out as separate writes; without this, delayed ACKs
+    # add ~40 ms to every keep-alive response and swamp the latency setting.
+    disable_nagle_algorithm = True
+
+    # (method, path regex, handler method name)
+    routes = [
+        ('GET', r'/organizations/?', 'get_orgs'),
+        ('GET', r'/organizations/(?P<org>[^/]+)/networks', 'get_networks'),
+        ('GET', r'/organizations/(?P<org>[^/]+)/devices', 'get_org_devices'),
+        ('GET', r'/networks/(?P<network>[^/]+)/devices', 'get_network_devices'),
+        ('GET', r'/organizations/(?P<org>[^/]+)/admins', 'get_admins'),
+        ('POST', r'/organizations/(?P<org>[^/]+)/admins', 'post_admin'),
+        ('PUT', r'/organizations/(?P<org>[^/]+)/admins/(?P<admin>[^/]+)', 'put_admin'),
+        ('GET', r'/networks/(?P<network>[^/]+)/wireless/rfProfiles', 'get_rf_profiles'),
+        ('POST', r'/networks/(?P<network>[^/]+)/wireless/rfProfiles', 'post_rf_profile'),
+        ('PUT', r'/networks/(?P<network>[^/]+)/wireless/rfProfiles/(?P<profile>[^/]+)', 'put_rf_profile'),
+        ('GET', r'/organizations/(?P<org>[^/]+)/switch/ports/bySwitch', 'get_org_switch_ports'),
+        ('GET', r'/devices/(?P<serial>[^/]+)/switchPorts', 'get_switch_ports'),
+        ('PUT', r'/devices/(?P<serial>[^/]+)/switchPorts/(?P<port>[^/]+)', 'put_switch_port'),
+        ('POST', r'/organizations/(?P<org>[^/]+)/actionBatches', 'post_action_batch'),
+        ('GET', r'/organizations/(?P<org>[^/]+)/actionBatches/(?P<batch>[^/]+)', 'get_action_batch'),
+    ]
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable.
+        pass
+
+    @property
+    def dashboard(self):
+        return self.server.dashboard
+
+    def send_json(self, status, body=None, headers=None):
+        payload = b'' if body is None else json.dumps(body).encode()
+        if self.command == 'GET' and status == 200:
+            # Conditional GETs: answer 304 with no body when the client already has this version.
+            etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get('If-None-Match') == etag:
+                status, payload = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'null') if length else None
+
+    def discard_body(self):
+        # A body left unread would be parsed as the start of the next request on this keep-alive connection.
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        # Any API version is accepted, so v1-only endpoints can be served alongside v0.
+        path = re.sub(r'^/api/v\d+', '', url.path)
+        self.query = parse_qs(url.query)
+        self.base = f'http://{self.headers.get("Host")}{url.path}'
+        config = self.dashboard.config
+
+        if config.latency:
+            time.sleep(config.latency)
+
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                with self.dashboard.lock:
+                    self.dashboard.calls[handler] += 1
+                    throttle = config.throttle_rate and random.random() < config.throttle_rate
+                    if throttle:
+                        self.dashboard.throttled += 1
+                if throttle:
+                    self.discard_body()
+                    self.send_json(429, {'errors': ['Too many requests']}, {'Retry-After': str(config.retry_after)})
+                    return
+                getattr(self, handler)(**match.groupdict())
+                return
+        self.discard_body()
+        self.send_json(404, {'errors': [f'No mock route for {method} {path}']})
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def send_list(self, items):
+        page, link = _page(items, self.query, self.base, self.dashboard.config.per_page)
+        self.send_json(200, page, {'Link': link} if link else None)
+
+    def get_orgs(self):
+        self.send_list(self.dashboard.orgs)
+
+    def get_networks(self, org):
+        if org not in self.dashboard.networks:
+            return self.send_json(404, {'errors': ['Organization not found']})
+        self.send_list(self.dashboard.networks[org])
+
+    def get_org_devices(self, org):
+        self.send_list(self.dashboard.devices.get(org, []))
+
+    def get_network_devices(self, network):
+        devices = [device for devices in self.dashboard.devices.values() for device in devices
+                   if device['networkId'] == network]
+        self.send_list(devices)
+
+    def get_admins(self, org):
+        if org not in self.dashboard.admins:
+            return self.send_json(404, {'errors': ['Organization not found']})
+        self.send_json(200, self.dashboard.admins[org])
+
+    def post_admin(self, org):
+        body = self.read_body()
+        with self.dashboard.lock:
+            admins = self.dashboard.admins.setdefault(org, [])
+            if any(admin['email'].lower() == body['email'].lower() for admin in admins):
+                return self.send_json(400, {'errors': ['Email already taken']})
+            admin = dict(body, id=str(next(self.dashboard.ids)))
+            admins.append(admin)
+        self.send_json(201, admin)
+
+    def put_admin(self, org, admin):
+        body = self.read_body()
+        with self.dashboard.lock:
+            for existing in self.dashboard.admins.get(org, []):
+                if existing['id'] == admin:
+                    existing.update(body)
+                    return self.send_json(200, existing)
+        self.send_json(404, {'errors': ['Admin not found']})
+
+    def get_rf_profiles(self, network):
+        if network not in self.dashboard.rf_profiles:
+            return self.send_json(404, {'errors': ['Network not found']})
+        self.send_json(200, self.dashboard.rf_profiles[network])
+
+    def post_rf_profile(self, network):
+        body = self.read_body()
+        with self.dashboard.lock:
+            profiles = self.dashboard.rf_profiles.setdefault(network, [])
+            if any(profile['name'] == body['name'] for profile in profiles):
+                return self.send_json(400, {'errors': ['Name already taken']})
+            profile = dict(body, id=str(next(self.dashboard.ids)), networkId=network)
+            profiles.append(profile)
+        self.send_json(201, profile)
+
+    def put_rf_profile(self, network, profile):
+        body = self.read_body()
+        with self.dashboard.lock:
+            existing = self.dashboard.find_rf_profile(network, profile)
+            if existing is not None:
+                existing.update(body)
+                return self.send_json(200, existing)
+        self.send_json(404, {'errors': ['RF profile not found']})
+
+    def get_org_switch_ports(self, org):
+        # The v1 shape: one entry per switch, with portId in place of number.
+        network_ids = self.query.get('networkIds[]')
+        switches = []
+        for device in self.dashboard.devices.get(org, []):
+            if network_ids and device['networkId'] not in network_ids:
+                continue
+            ports = [dict({key: value for key, value in port.items() if key != 'number'}, portId=str(port['number']))
+                     for port in self.dashboard.switch_ports[device['serial']].values()]
+            switches.append({'serial': device['serial'], 'model': device['model'],
+                             'network': {'id': device['networkId']}, 'ports': ports})
+        self.send_list(switches)
+
+    def get_switch_ports(self, serial):
+        if serial not in self.dashboard.switch_ports:
+            return self.send_json(404, {'errors': ['Device not found']})
+        self.send_json(200, list(self.dashboard.switch_ports[serial].values()))
+
+    def put_switch_port(self, serial, port):
+        body = self.read_body()
+        with self.dashboard.lock:
+            ports = self.dashboard.switch_ports.get(serial, {})
+            if port not in ports:
+                return self.send_json(404, {'errors': ['Port not found']})
+            ports[port].update(body)
+        self.send_json(200, ports[port])
+
+    def post_action_batch(self, org):
+        body = self.read_body()
+        errors = []
+        with self.dashboard.lock:
+            targets = [self.dashboard.find_resource(action['resource']) for action in body.get('actions', [])]
+            errors = [f"Unknown resource {action['resource']}"
+                      for action, target in zip(body.get('actions', []), targets) if target is None]
+            if not errors:
+                for action, target in zip(body['actions'], targets):
+                    target.update(action['body'])
+            batch = {'id': str(next(self.dashboard.ids)), 'organizationId': org, 'confirmed': True,
+                     'synchronous': False, 'actions': body.get('actions', []),
+                     'status': {'completed': not errors, 'failed': bool(errors), 'errors': errors}}
+            self.dashboard.action_batches[batch['id']] = batch
+        self.send_json(201, batch)
+
+    def get_action_batch(self, org, batch):
+        if batch not in self.dashboard.action_batches:
+            return self.send_json(404, {'errors': ['Action batch not found']})
+        self.send_json(200, self.dashboard.action_batches[batch])
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    '''
+    Start a mock Dashboard on a background thread.
+
+    :param config: mockConfig object
+    :param host: Address to listen on
+    :param port: Port to listen on, or 0 for any free port
+
+    :return: Tuple of (server, base URL to use as MERAKI_BASE_URL)
+    '''
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.dashboard = MockDashboard(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}{API_PREFIX}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local mock Meraki Dashboard API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--orgs', type=int, default=mockConfig.orgs)
+    parser.add_argument('--networks', type=int, default=mockConfig.networks, help='networks per org')
+    parser.add_argument('--switches', type=int, default=mockConfig.switches, help='switches per org')
+    parser.add_argument('--ports', type=int, default=mockConfig.ports, help='ports per switch')
+    parser.add_argument('--admins', type=int, default=mockConfig.admins, help='admins in the standard org')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls answered with 429')
+    parser.add_argument('--retry-after', type=float, default=mockConfig.retry_after)
+    args = parser.parse_args()
+
+    config = mockConfig(orgs=args.orgs, networks=args.networks, switches=args.switches, ports=args.ports,
+                        admins=args.admins, latency=args.latency, throttle_rate=args.throttle_rate,
+                        retry_after=args.retry_after)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f'Mock Dashboard running. Set MERAKI_BASE_URL={base_url}')
+    print(f'Standard admins org ID: {STANDARD_ORG_ID}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''
+Tests for meraki_snapshot's commit, resolve and diff.
+
+python -m pytest test_meraki_snapshot.py  (or python -m unittest test_meraki_snapshot)
+'''
+
+import tempfile
+import unittest
+
+import meraki_snapshot
+
+
+def port(number, **settings):
+    return {'number': number, 'name': f'Port {number}', 'vlan': 1, **settings}
+
+
+class SnapshotStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = meraki_snapshot.SnapshotStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def diff(self, snapshot_id):
+        '''Diff a snapshot against its parent, as -m diff does.'''
+        parent = self.store.load(snapshot_id)['parent']
+        return list(self.store.diff(self.store.resolve(parent), self.store.resolve(snapshot_id)))
+
+    def test_first_commit_records_every_port(self):
+        snapshot_id, changed = self.store.commit([('SW1', [port(1), port(2)])])
+
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.store.head(), snapshot_id)
+        self.assertIsNone(self.store.load(snapshot_id)['parent'])
+        self.assertEqual(self.store.ports(self.store.resolve(snapshot_id), 'SW1'), [
+            {'number': '1', 'name': 'Port 1', 'vlan': 1},
+            {'number': '2', 'name': 'Port 2', 'vlan': 1},
+        ])
+
+    def test_identical_configs_are_stored_once(self):
+        self.store.commit([('SW1', [port(1, name='Uplink'), port(2, name='Uplink')])])
+
+        state = self.store.resolve(self.store.head())
+        self.assertEqual(state['SW1']['1'], state['SW1']['2'])
+
+    def test_unchanged_commit_writes_nothing(self):
+        first, _ = self.store.commit([('SW1', [port(1)])])
+
+        self.assertEqual(self.store.commit([('SW1', [port(1)])]), (None, 0))
+        self.assertEqual(self.store.snapshots(), [first])
+
+    def test_commit_records_only_changed_ports(self):
+        self.store.commit([('SW1', [port(1), port(2)]), ('SW2', [port(1)])])
+        second, changed = self.store.commit([('SW1', [port(1), port(2, vlan=20)])])
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(list(self.store.load(second)['changes']), ['SW1'])
+        self.assertEqual(list(self.store.load(second)['changes']['SW1']), ['2'])
+        # Switches left out of a commit keep their earlier state.
+        self.assertIn('SW2', self.store.resolve(second))
+
+    def test_resolve_replays_the_chain(self):
+        first, _ = self.store.commit([('SW1', [port(1)])])
+        second, _ = self.store.commit([('SW1', [port(1, vlan=20)])])
+        third, _ = self.store.commit([('SW1', [port(1, vlan=30)])])
+
+        self.assertEqual(self.store.snapshots(), [first, second, third])
+        for snapshot_id, vlan in ((first, 1), (second, 20), (third, 30)):
+            self.assertEqual(self.store.ports(self.store.resolve(snapshot_id), 'SW1')[0]['vlan'], vlan)
+
+    def test_resolve_none_is_empty(self):
+        self.store.commit([('SW1', [port(1)])])
+
+        self.assertEqual(self.store.resolve(None), {})
+
+    def test_diff_of_first_snapshot_shows_ports_added(self):
+        first, _ = self.store.commit([('SW1', [port(1), port(2)])])
+        self.store.commit([('SW1', [port(1, vlan=20), port(2)])])
+
+        self.assertEqual([(serial, number, old) for serial, number, old, new in self.diff(first)],
+                         [('SW1', '1', None), ('SW1', '2', None)])
+
+    def test_diff_shows_changed_port(self):
+        first, _ = self.store.commit([('SW1', [port(1), port(2)])])
+        second, _ = self.store.commit([('SW1', [port(1), port(2, vlan=20)])])
+
+        state = self.store.resolve(first)
+        self.assertEqual(self.diff(second), [('SW1', '2', state['SW1']['2'], self.store.resolve(second)['SW1']['2'])])
+
+    def test_removed_port(self):
+        first, _ = self.store.commit([('SW1', [port(1), port(2), port(3)])])
+        second, changed = self.store.commit([('SW1', [port(1), port(3)])])
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(self.store.load(second)['changes'], {'SW1': {'2': None}})
+        self.assertEqual(sorted(self.store.resolve(second)['SW1']), ['1', '3'])
+        self.assertEqual([(number, new) for serial, number, old, new in self.diff(second)], [('2', None)])
+        # The earlier state still has the port.
+        self.assertEqual(sorted(self.store.resolve(first)['SW1']), ['1', '2', '3'])
+
+    def test_port_order_is_numeric(self):
+        snapshot_id, _ = self.store.commit([('SW1', [port(10), port(2), port(1)])])
+
+        self.assertEqual([p['number'] for p in self.store.ports(self.store.resolve(snapshot_id), 'SW1')],
+                         ['1', '2', '10'])
+
+    def test_digest_ignores_key_order_and_escapes_non_ascii(self):
+        self.assertEqual(meraki_snapshot.canonical_json({'b': 1, 'name': 'Büro'}),
+                         b'{"b":1,"name":"B\\u00fcro"}')
+        self.assertEqual(self.store.put_object({'a': 1, 'b': 2}), self.store.put_object({'b': 2, 'a': 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()